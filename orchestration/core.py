@@ -390,14 +390,14 @@ class OrchestrationEngine:
                     # Run in thread pool for sync functions
                     if task.timeout:
                         result = await asyncio.wait_for(
-                            asyncio.get_event_loop().run_in_executor(
+                            asyncio.get_running_loop().run_in_executor(
                                 self.thread_executor,
                                 lambda: task.function(*task.args, **task.kwargs)
                             ),
                             timeout=task.timeout
                         )
                     else:
-                        result = await asyncio.get_event_loop().run_in_executor(
+                        result = await asyncio.get_running_loop().run_in_executor(
                             self.thread_executor,
                             lambda: task.function(*task.args, **task.kwargs)
                         )
@@ -497,7 +497,7 @@ class OrchestrationEngine:
         # Publish to Redis
         if self.redis_client:
             try:
-                await asyncio.get_event_loop().run_in_executor(
+                await asyncio.get_running_loop().run_in_executor(
                     None,
                     lambda: self.redis_client.publish('orchestration_events', json.dumps(event, default=str))
                 )
@@ -11,6 +11,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from vertex_agents.real_vertex_agent import ProductionVertexAIAgent
+from vertex_agents.llm_connection_manager import install_uvloop
 from agents.regulator_discovery_agent import RegulatorDiscoveryAgent
 from agents.enrichment_agent import WebsiteEnrichmentAgent
 from database.database_manager import DatabaseManager
@@ -112,25 +113,17 @@ async def main():
             print(f"\n🧠 Phase 3: Vertex AI Enhancement ({len(final_associations)} associations)")
             ai_agent = ProductionVertexAIAgent()
             
-            ai_enhanced_associations = []
+            # Comprehensive AI analysis, run concurrently within the agent's rate limits
+            ai_analyses = await ai_agent.analyze_many(final_associations)
+            analysis_timestamp = datetime.now().isoformat()
             
-            for i, association in enumerate(final_associations, 1):
-                print(f"   🤖 AI analyzing ({i}/{len(final_associations)}): {association.get('name', 'Unknown')}")
-                
-                # Get comprehensive AI analysis
-                ai_analysis = await ai_agent.analyze_housing_association_comprehensive(association)
-                
-                # Merge AI insights with existing data
+            # Merge AI insights with existing data
+            for association, ai_analysis in zip(final_associations, ai_analyses):
                 association['ai_insights'] = ai_analysis
                 association['ai_enhanced'] = True
-                association['ai_analysis_timestamp'] = datetime.now().isoformat()
-                
-                ai_enhanced_associations.append(association)
-                
-                # Small delay to respect rate limits
-                await asyncio.sleep(1)
+                association['ai_analysis_timestamp'] = analysis_timestamp
             
-            final_associations = ai_enhanced_associations
+            print(f"   🤖 AI analysis completed for {len(ai_analyses)} associations")
             
             # Generate market intelligence
             if args.comprehensive:
@@ -200,4 +193,5 @@ async def main():
         raise
 
 if __name__ == "__main__":
+    install_uvloop()
     asyncio.run(main())
\ No newline at end of file
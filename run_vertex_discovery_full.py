@@ -16,6 +16,7 @@ import time
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from vertex_agents.real_vertex_agent import ProductionVertexAIAgent
+from vertex_agents.llm_connection_manager import install_uvloop
 from agents.regulator_discovery_agent import RegulatorDiscoveryAgent
 from agents.enrichment_agent import WebsiteEnrichmentAgent
 from database.database_manager import DatabaseManager
@@ -218,4 +219,5 @@ async def main():
         raise
 
 if __name__ == "__main__":
+    install_uvloop()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Test the LLM connection manager's circuit breakers
+"""
+
+import asyncio
+
+from vertex_agents.llm_connection_manager import BaseLLMProvider, LLMConnectionManager
+
+class FlakyStreamProvider(BaseLLMProvider):
+    """Streams a JSON object, failing every other call before the first chunk"""
+
+    def __init__(self):
+        super().__init__({})
+        self.calls = 0
+
+    async def stream_content(self, prompt: str, **kwargs):
+        self.calls += 1
+        if self.calls % 2 == 0:
+            raise RuntimeError("provider unavailable")
+        for chunk in ('{"ok": true}', ' trailing text', ' more text'):
+            yield chunk
+
+def make_manager(provider: BaseLLMProvider) -> LLMConnectionManager:
+    """A manager whose only provider is the one given, without probing real providers"""
+    manager = LLMConnectionManager()
+    manager.providers['mock']['instance'] = provider
+    manager.providers['mock']['status'] = 'connected'
+    manager.active_provider = 'mock'
+    manager.fallback_providers = []
+    manager._started = True
+    return manager
+
+async def stream_first_chunk(manager: LLMConnectionManager):
+    """Read one chunk and close the stream early, as the analysis streaming does"""
+    stream = manager.stream_content("prompt")
+    try:
+        return await stream.__anext__()
+    finally:
+        await stream.aclose()
+
+def test_stream_closed_early_counts_as_success():
+    """Alternating successes and failures must never open the circuit"""
+
+    async def run():
+        manager = make_manager(FlakyStreamProvider())
+        breaker = manager._breakers['mock']
+
+        for call in range(20):
+            try:
+                await stream_first_chunk(manager)
+            except Exception:
+                pass
+            assert breaker.state == 'closed', f"circuit opened on call {call + 1}"
+
+        print("   ✅ Circuit stayed closed across 20 alternating calls")
+
+    asyncio.run(run())
+
+def test_half_open_probe_closed_early_closes_circuit():
+    """A probe stream that is closed after its first chunk recovers the circuit"""
+
+    async def run():
+        manager = make_manager(FlakyStreamProvider())
+        breaker = manager._breakers['mock']
+        breaker.reset_after = 0.01
+        for _ in range(breaker.fail_threshold):
+            breaker.record_failure()
+        assert breaker.state == 'open'
+
+        await asyncio.sleep(0.02)
+        assert await stream_first_chunk(manager) == '{"ok": true}'
+        assert breaker.state == 'closed'
+
+        print("   ✅ Half-open probe closed the circuit")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    print("🔍 Testing circuit breakers...")
+    test_stream_closed_early_counts_as_success()
+    test_half_open_probe_closed_early_closes_circuit()
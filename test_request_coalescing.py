@@ -0,0 +1,98 @@
+"""
+Test that concurrent identical generation requests share one LLM call
+"""
+
+import asyncio
+
+from vertex_agents.real_vertex_agent import ProductionVertexAIAgent
+
+class FakeManager:
+    """Stands in for the LLM connection manager, counting calls"""
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.active_provider = 'fake'
+        self.providers = {'fake': {'name': 'Fake Provider'}}
+
+    async def generate_content(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"response to {prompt}"
+
+def make_agent(manager: FakeManager) -> ProductionVertexAIAgent:
+    agent = ProductionVertexAIAgent()
+    agent.llm_manager = manager
+    return agent
+
+async def shared_call(agent: ProductionVertexAIAgent, prompt: str = "same prompt"):
+    kwargs = {}
+    return await agent._generate_shared(prompt, kwargs, agent._response_key(prompt, kwargs))
+
+def test_identical_calls_share_one_manager_call():
+    """N concurrent identical requests make a single manager call"""
+
+    async def run():
+        manager = FakeManager()
+        agent = make_agent(manager)
+
+        results = await asyncio.gather(*[shared_call(agent) for _ in range(10)])
+
+        assert results == ["response to same prompt"] * 10
+        assert manager.calls == 1
+        assert not agent._inflight
+
+        print("   ✅ 10 identical calls made 1 manager call")
+
+    asyncio.run(run())
+
+def test_leader_failure_reaches_every_waiter():
+    """An error from the shared call is raised to every request waiting on it"""
+
+    async def run():
+        manager = FakeManager(error=RuntimeError("provider down"))
+        agent = make_agent(manager)
+
+        results = await asyncio.gather(*[shared_call(agent) for _ in range(5)], return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) and str(result) == "provider down" for result in results)
+        assert manager.calls == 1
+        assert not agent._inflight
+
+        print("   ✅ Leader failure reached all 5 callers")
+
+    asyncio.run(run())
+
+def test_leader_cancellation_hands_over_to_a_waiter():
+    """Cancelling the caller making the shared call doesn't cancel the others"""
+
+    async def run():
+        manager = FakeManager(delay=0.1)
+        agent = make_agent(manager)
+
+        leader = asyncio.ensure_future(shared_call(agent))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(shared_call(agent)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*waiters)
+
+        assert leader.cancelled()
+        assert results == ["response to same prompt"] * 3
+        # One call from the cancelled leader, one from the waiter that took over
+        assert manager.calls == 2
+        assert not agent._inflight
+
+        print("   ✅ Waiters completed after the leader was cancelled")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    print("🔍 Testing request coalescing...")
+    test_identical_calls_share_one_manager_call()
+    test_leader_failure_reaches_every_waiter()
+    test_leader_cancellation_hands_over_to_a_waiter()
@@ -1,15 +1,12 @@
 import os
 import asyncio
-from vertex_agents.llm_connection_manager import get_llm_manager
+from vertex_agents.llm_connection_manager import get_llm_manager_async, install_uvloop
 
 async def test_vertex_connection():
     print("Testing Vertex AI connection...")
     
-    # Get the LLM manager
-    llm_manager = get_llm_manager()
-    
-    # Wait a moment for initialization
-    await asyncio.sleep(2)
+    # Get the LLM manager once its provider connections have been tested
+    llm_manager = await get_llm_manager_async()
     
     # Check provider status
     status = llm_manager.get_provider_status()
@@ -34,4 +31,5 @@ async def test_vertex_connection():
         print("\nNo active provider available for testing.")
 
 if __name__ == "__main__":
+    install_uvloop()
     asyncio.run(test_vertex_connection())
\ No newline at end of file
@@ -1,14 +1,11 @@
 import asyncio
-from vertex_agents.llm_connection_manager import get_llm_manager
+from vertex_agents.llm_connection_manager import get_llm_manager_async, install_uvloop
 
 async def test_vertex_direct():
     print("Testing Vertex AI connection directly...")
     
-    # Get the LLM manager
-    llm_manager = get_llm_manager()
-    
-    # Wait for initialization
-    await asyncio.sleep(3)
+    # Get the LLM manager once its provider connections have been tested
+    llm_manager = await get_llm_manager_async()
     
     # Check status
     status = llm_manager.get_provider_status()
@@ -47,4 +44,5 @@ async def test_vertex_direct():
                 print(f"❌ Manual test failed: {e}")
 
 if __name__ == "__main__":
+    install_uvloop()
     asyncio.run(test_vertex_direct())
\ No newline at end of file
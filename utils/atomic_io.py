@@ -0,0 +1,38 @@
+"""
+Atomic file writes shared by the storage and output modules
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Process umask, needed to give atomically written files the usual permissions
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def atomic_open(path: str, buffering: int = -1):
+    """Open a temporary file beside path for binary writing.
+
+    The temporary file is renamed over path only once the block completes,
+    so readers never observe a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb', buffering) as f:
+            yield f
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path: str, payload: bytes):
+    """Atomically replace path with payload"""
+    with atomic_open(path) as f:
+        f.write(payload)
@@ -1,137 +1,487 @@
 import os
 import json
+import logging
+import mmap
+import threading
+import time
 import pandas as pd
-from datetime import datetime
-from typing import Dict, List, Any
-import shutil
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from utils.atomic_io import atomic_open, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# File extension for each supported raw discovery format
+RAW_FORMAT_EXTENSIONS = {
+    'json': '.json',
+    'msgpack': '.msgpack',
+    'pickle': '.pkl',
+}
+
+# Processed dataset extensions; JSON outranks Parquet when both hold the same snapshot
+DATASET_FORMATS = (
+    ('.json.zst', 1),
+    ('.json', 1),
+    ('.parquet', 0),
+)
+
+def _read_msgpack(f):
+    """Load a MessagePack raw data file"""
+    if msgpack is None:
+        raise ImportError("msgpack not installed. Run: pip install msgpack")
+    return msgpack.unpack(f, raw=False)
+
+
+# Loaders keyed by extension so downstream code can read any raw file by name
+RAW_READERS = {
+    '.json': json.load,
+    '.msgpack': _read_msgpack,
+    '.pkl': pickle.load,
+}
+
+# Filename timestamp cache: [epoch second, formatted timestamp, calls within that second]
+_ts_state = [0, '', 0]
+_ts_lock = threading.Lock()
+
+
+def _now_ts() -> str:
+    """Return a filename timestamp, formatting it at most once per second.
+    
+    Repeat calls within the same second get a _000001, _000002, ... suffix so
+    that files saved back to back never overwrite each other. The suffix is
+    zero-padded so names still sort chronologically as plain strings, which
+    load_latest_dataset relies on.
+    """
+    second = int(time.time())
+    with _ts_lock:
+        if _ts_state[0] != second:
+            _ts_state[:] = [second, time.strftime("%Y%m%d_%H%M%S", time.localtime(second)), 0]
+            return _ts_state[1]
+        _ts_state[2] += 1
+        return f"{_ts_state[1]}_{_ts_state[2]:06d}"
+
+
+# Whether files can be created relative to an open directory descriptor
+_DIR_FD_SUPPORTED = (
+    hasattr(os, 'O_DIRECTORY')
+    and os.open in os.supports_dir_fd
+    and os.rename in os.supports_dir_fd
+    and os.unlink in os.supports_dir_fd
+)
+
+
+def _atomic_write_at(dir_fd: int, filename: str, payload: bytes):
+    """Atomically replace filename inside an open directory with payload.
+    
+    Same temp-file-and-rename scheme as atomic_write, but every call is
+    resolved relative to dir_fd so the directory path is not walked again.
+    """
+    tmp_name = f".{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666, dir_fd=dir_fd)
+    try:
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp_name, filename, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+    except BaseException:
+        try:
+            os.unlink(tmp_name, dir_fd=dir_fd)
+        except OSError:
+            pass
+        raise
+
+
+def _has_content(path: str, payload: bytes) -> bool:
+    """Check whether path already holds exactly payload.
+    
+    A size mismatch short-circuits; otherwise the existing file is mapped
+    and compared in place, which is far cheaper than rewriting it.
+    """
+    try:
+        if os.path.getsize(path) != len(payload):
+            return False
+        with open(path, 'rb') as f:
+            if len(payload) < mmap.PAGESIZE:
+                return f.read() == payload
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as existing:
+                return existing == payload
+    except FileNotFoundError:
+        return False
+
+
+# json.dumps builds a new JSONEncoder on every call when given options;
+# encoders keep no state between calls, so one instance per layout is shared
+_JSON_ENCODERS = {
+    True: json.JSONEncoder(indent=2, default=str),
+    False: json.JSONEncoder(default=str),
+}
+
+
+def _dump_json(data: Any, pretty: bool = False) -> bytes:
+    """Encode data as JSON bytes, optionally indented"""
+    if orjson is not None:
+        # Datetimes go through default=str like the stdlib encoder, keeping the
+        # str() format ('2024-01-01 12:00:00') rather than orjson's ISO 'T' form
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                  | (orjson.OPT_INDENT_2 if pretty else 0))
+        return orjson.dumps(data, default=str, option=option)
+    return _JSON_ENCODERS[pretty].encode(data).encode('utf-8')
+
+
+def _write_json_array(f, records: Iterable[Any], pretty: bool = False):
+    """Write records as a JSON array to a binary file object one element at a time"""
+    f.write(b'[\n')
+    first = True
+    for record in records:
+        if not first:
+            f.write(b',\n')
+        f.write(_dump_json(record, pretty))
+        first = False
+    f.write(b'\n]')
+
+
+def _stream_json_array(path: str, records: Iterable[Any], compress: bool = False, pretty: bool = False):
+    """Write records as a JSON array one element at a time.
+    
+    Only one encoded record is held in memory at once, so peak memory stays
+    flat regardless of how many records are written. With compress=True the
+    stream is zstd-compressed on the way to disk.
+    """
+    with atomic_open(path, buffering=1 << 20) as f:
+        if compress:
+            with zstd.ZstdCompressor(level=3, threads=-1).stream_writer(f, closefd=False) as writer:
+                _write_json_array(writer, records, pretty)
+        else:
+            _write_json_array(f, records, pretty)
+
+
+def _read_json(path: str) -> Any:
+    """Read a JSON file, decompressing it first if it has a .zst suffix"""
+    with open(path, 'rb') as f:
+        if path.endswith('.zst'):
+            data = zstd.ZstdDecompressor().stream_reader(f).read()
+        else:
+            data = f.read()
+    
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+if msgspec is not None:
+    class CompaniesHouseRecord(msgspec.Struct, omit_defaults=True):
+        """Companies House payload as assembled by ComprehensiveDataAgent.
+        
+        Declaring the schema lets msgspec encode it with a specialised
+        encoder; fields outside the schema are carried in `rest`.
+        """
+        company_number: str
+        company_name: Optional[str] = None
+        filing_categories: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        total_filings: Optional[int] = None
+        latest_accounts_date: Optional[str] = None
+        accounts_filing_frequency: Optional[int] = None
+        director_turnover: Optional[int] = None
+        office_stability: Optional[int] = None
+        has_charges: Optional[bool] = None
+        current_officers: Optional[List[Dict[str, Any]]] = None
+        officer_analysis: Optional[Dict[str, Any]] = None
+        rest: Dict[str, Any] = {}
+        
+        @classmethod
+        def from_dict(cls, company_number: str, data: Dict) -> 'CompaniesHouseRecord':
+            """Build a record from a legacy Companies House dict"""
+            known = {k: v for k, v in data.items() if k in cls.__struct_fields__ and k != 'rest'}
+            rest = {k: v for k, v in data.items() if k not in known}
+            known.setdefault('company_number', company_number)
+            return cls(rest=rest, **known)
+    
+    # One shared encoder; msgspec caches the per-type encoding plan on it
+    _CH_ENCODER = msgspec.json.Encoder(enc_hook=str)
+
 
 class DataStorage:
-    def __init__(self, base_path: str = 'storage'):
+    # Base paths whose directory tree has already been created in this process
+    _initialized: set = set()
+    
+    DIRECTORIES = [
+        'raw_data',
+        'processed_data', 
+        'arc_returns',
+        'annual_reports',
+        'regulatory_data',
+        'companies_house_data',
+        'social_media_data',
+        'website_data'
+    ]
+    
+    def __init__(self, base_path: str = 'storage', raw_format: str = 'json', pretty_default: bool = False):
+        if raw_format not in RAW_FORMAT_EXTENSIONS:
+            raise ValueError(f"Unsupported raw format: {raw_format}")
+        if raw_format == 'msgpack' and msgpack is None:
+            raise ImportError("msgpack not installed. Run: pip install msgpack")
+        
         self.base_path = base_path
+        self.raw_format = raw_format
+        # Stored files are machine-read, so JSON is compact unless indentation is requested
+        self.pretty_default = pretty_default
+        # Open subdirectory descriptors while a writer_session is active
+        self._dir_fds: Dict[str, int] = {}
         self.setup_directories()
+    
+    def _resolve_pretty(self, pretty: bool = None) -> bool:
+        """Resolve a per-call pretty flag against the instance default"""
+        return self.pretty_default if pretty is None else pretty
         
     def setup_directories(self):
         """Create storage directory structure"""
-        directories = [
-            'raw_data',
-            'processed_data', 
-            'arc_returns',
-            'annual_reports',
-            'regulatory_data',
-            'companies_house_data',
-            'social_media_data',
-            'website_data'
-        ]
-        
-        for directory in directories:
-            os.makedirs(os.path.join(self.base_path, directory), exist_ok=True)
-    
-    def save_raw_discovery_data(self, associations: List[Dict], source: str) -> str:
+        # Subdirectory paths, joined once rather than on every save
+        self.paths = {directory: os.path.join(self.base_path, directory) for directory in self.DIRECTORIES}
+        
+        if self.base_path in DataStorage._initialized:
+            return
+        
+        # Walk the parents once, then create each leaf directly
+        os.makedirs(self.base_path, exist_ok=True)
+        for directory in self.DIRECTORIES:
+            try:
+                os.mkdir(self.paths[directory])
+            except FileExistsError:
+                pass
+        
+        DataStorage._initialized.add(self.base_path)
+    
+    @contextmanager
+    def writer_session(self):
+        """Keep the storage subdirectories open for a bulk run of writes.
+        
+        Inside the session, per-company files are created relative to an
+        open directory descriptor instead of re-resolving the full path on
+        every open. Usage:
+        
+            with storage.writer_session():
+                for company_number, regulator, data in results:
+                    storage.save_regulatory_data(company_number, regulator, data)
+        """
+        if self._dir_fds or not _DIR_FD_SUPPORTED:
+            # Already inside a session, or the platform lacks *at() calls
+            yield self
+            return
+        
+        try:
+            for directory in self.DIRECTORIES:
+                self._dir_fds[directory] = os.open(self.paths[directory], os.O_RDONLY | os.O_DIRECTORY)
+            yield self
+        finally:
+            for fd in self._dir_fds.values():
+                os.close(fd)
+            self._dir_fds = {}
+    
+    def _write_file(self, directory: str, filename: str, payload: bytes) -> str:
+        """Atomically write payload to directory/filename, using the session descriptor if open"""
+        filepath = f"{self.paths[directory]}{os.sep}{filename}"
+        
+        dir_fd = self._dir_fds.get(directory)
+        if dir_fd is not None:
+            _atomic_write_at(dir_fd, filename, payload)
+        else:
+            atomic_write(filepath, payload)
+        
+        return filepath
+    
+    def save_raw_discovery_data(self, associations: Iterable[Dict], source: str, pretty: bool = None) -> str:
         """Save raw discovery data"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"raw_discovery_{source}_{timestamp}.json"
-        filepath = os.path.join(self.base_path, 'raw_data', filename)
+        timestamp = _now_ts()
+        filename = f"raw_discovery_{source}_{timestamp}{RAW_FORMAT_EXTENSIONS[self.raw_format]}"
+        filepath = f"{self.paths['raw_data']}{os.sep}{filename}"
         
-        with open(filepath, 'w') as f:
-            json.dump(associations, f, indent=2, default=str)
+        # Raw data is only consumed internally, so binary formats are preferred when configured.
+        # Those encode one whole object, so a generator is collected into a list first
+        if self.raw_format == 'msgpack':
+            atomic_write(filepath, msgpack.packb(list(associations), default=str, use_bin_type=True))
+        elif self.raw_format == 'pickle':
+            with atomic_open(filepath) as f:
+                pickle.dump(list(associations), f, protocol=5)
+        else:
+            _stream_json_array(filepath, associations, pretty=self._resolve_pretty(pretty))
         
-        print(f"Raw discovery data saved: {filepath}")
+        logger.info("Raw discovery data saved: %s", filepath)
         return filepath
     
-    def save_companies_house_data(self, company_number: str, data: Dict) -> str:
+    def load_raw_discovery_data(self, filepath: str) -> List[Dict]:
+        """Load raw discovery data, picking the reader from the file extension"""
+        extension = os.path.splitext(filepath)[1]
+        reader = RAW_READERS.get(extension)
+        if reader is None:
+            raise ValueError(f"Unsupported raw data file: {filepath}")
+        
+        with open(filepath, 'rb') as f:
+            return reader(f)
+    
+    def save_companies_house_data(self, company_number: str, data: Dict, pretty: bool = None) -> str:
         """Save individual Companies House data"""
         filename = f"{company_number}.json"
-        filepath = os.path.join(self.base_path, 'companies_house_data', filename)
+        return self._write_file('companies_house_data', filename, _dump_json(data, self._resolve_pretty(pretty)))
+    
+    def save_companies_house_record(self, record: 'CompaniesHouseRecord', pretty: bool = None) -> str:
+        """Save a typed Companies House record using the shared msgspec encoder"""
+        if msgspec is None:
+            raise ImportError("msgspec not installed. Run: pip install msgspec")
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        payload = _CH_ENCODER.encode(record)
+        if self._resolve_pretty(pretty):
+            payload = msgspec.json.format(payload, indent=2)
         
-        return filepath
+        return self._write_file('companies_house_data', f"{record.company_number}.json", payload)
     
-    def save_arc_return(self, company_number: str, arc_data: Dict) -> str:
+    def save_arc_return(self, company_number: str, arc_data: Dict, pretty: bool = None) -> str:
         """Save ARC return data"""
         filename = f"{company_number}_arc.json"
-        filepath = os.path.join(self.base_path, 'arc_returns', filename)
-        
-        with open(filepath, 'w') as f:
-            json.dump(arc_data, f, indent=2, default=str)
-        
-        return filepath
+        return self._write_file('arc_returns', filename, _dump_json(arc_data, self._resolve_pretty(pretty)))
     
     def save_annual_report(self, company_number: str, report_url: str, report_data: bytes = None) -> str:
-        """Save annual report"""
+        """Save annual report, skipping the write if identical content is already stored"""
         if report_data:
             # Save actual report file
             filename = f"{company_number}_annual_report.pdf"
-            filepath = os.path.join(self.base_path, 'annual_reports', filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(report_data)
+            payload = report_data
         else:
             # Save just the URL reference
             filename = f"{company_number}_annual_report_url.txt"
-            filepath = os.path.join(self.base_path, 'annual_reports', filename)
-            
-            with open(filepath, 'w') as f:
-                f.write(report_url)
+            payload = report_url.encode('utf-8')
+        
+        filepath = f"{self.paths['annual_reports']}{os.sep}{filename}"
+        
+        if not _has_content(filepath, payload):
+            atomic_write(filepath, payload)
         
         return filepath
     
-    def save_regulatory_data(self, company_number: str, regulator: str, data: Dict) -> str:
+    def save_regulatory_data(self, company_number: str, regulator: str, data: Dict, pretty: bool = None) -> str:
         """Save regulatory data"""
         filename = f"{company_number}_{regulator}.json"
-        filepath = os.path.join(self.base_path, 'regulatory_data', filename)
+        return self._write_file('regulatory_data', filename, _dump_json(data, self._resolve_pretty(pretty)))
+    
+    def save_many(self, items: List[Tuple[str, str, Dict]], pretty: bool = None) -> List[str]:
+        """Save many JSON records concurrently.
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        Each item is a (subdirectory, filename, data) tuple, e.g.
+        ('arc_returns', '12345678_arc.json', arc_data). File writes release
+        the GIL, so encoding and disk I/O overlap across worker threads.
+        """
+        pretty = self._resolve_pretty(pretty)
         
-        return filepath
+        def write(subdir, filename, data):
+            return self._write_file(subdir, filename, _dump_json(data, pretty))
+        
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            futures = [pool.submit(write, subdir, filename, data) for subdir, filename, data in items]
+            return [future.result() for future in futures]
     
-    def save_processed_dataset(self, associations: List[Dict], dataset_name: str) -> str:
+    def save_processed_dataset(self, associations: List[Dict], dataset_name: str, compress: bool = True, pretty: bool = None, legacy_csv: bool = False) -> str:
         """Save final processed dataset"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = _now_ts()
         
-        # Save as JSON
-        json_filename = f"{dataset_name}_{timestamp}.json"
-        json_filepath = os.path.join(self.base_path, 'processed_data', json_filename)
+        # Compression needs the optional zstandard package; write plain JSON without it
+        compress = compress and zstd is not None
         
-        with open(json_filepath, 'w') as f:
-            json.dump(associations, f, indent=2, default=str)
+        # Save as JSON
+        json_filename = f"{dataset_name}_{timestamp}.json{'.zst' if compress else ''}"
+        json_filepath = f"{self.paths['processed_data']}{os.sep}{json_filename}"
         
-        # Save as CSV
-        csv_filename = f"{dataset_name}_{timestamp}.csv"
-        csv_filepath = os.path.join(self.base_path, 'processed_data', csv_filename)
+        _stream_json_array(json_filepath, associations, compress=compress, pretty=self._resolve_pretty(pretty))
         
+        # Save the tabular copy as Parquet (typed, columnar) unless CSV is requested
+        # or pyarrow is unavailable
         df = pd.DataFrame(associations)
-        df.to_csv(csv_filepath, index=False)
+        table_filepath = None
+        
+        if not legacy_csv and pq is not None:
+            table_filepath = f"{self.paths['processed_data']}{os.sep}{dataset_name}_{timestamp}.parquet"
+            try:
+                with atomic_open(table_filepath) as f:
+                    df.to_parquet(f, engine='pyarrow', compression='zstd', index=False)
+            except (pa.ArrowException, TypeError, ValueError) as e:
+                logger.warning("Parquet export failed, falling back to CSV: %s", e)
+                table_filepath = None
+        
+        if table_filepath is None:
+            table_filepath = f"{self.paths['processed_data']}{os.sep}{dataset_name}_{timestamp}.csv"
+            with atomic_open(table_filepath) as f:
+                df.to_csv(f, index=False)
         
-        print(f"Processed dataset saved: {json_filepath} and {csv_filepath}")
+        logger.info("Processed dataset saved: %s and %s", json_filepath, table_filepath)
         return json_filepath
     
     def load_latest_dataset(self, dataset_name: str) -> List[Dict]:
         """Load the latest processed dataset"""
-        processed_dir = os.path.join(self.base_path, 'processed_data')
+        processed_dir = self.paths['processed_data']
         
-        # Find latest file matching pattern
-        matching_files = [f for f in os.listdir(processed_dir) if f.startswith(dataset_name) and f.endswith('.json')]
+        # Find latest file matching pattern; timestamped names order chronologically,
+        # so a single running max replaces collecting and sorting every match
+        latest = None
+        with os.scandir(processed_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith(dataset_name):
+                    continue
+                for extension, rank in DATASET_FORMATS:
+                    if entry.name.endswith(extension):
+                        key = (entry.name[:-len(extension)], rank)
+                        if latest is None or key > latest[0]:
+                            latest = (key, entry.path)
+                        break
         
-        if not matching_files:
+        if latest is None:
             return []
         
-        latest_file = sorted(matching_files)[-1]  # Get most recent
-        filepath = os.path.join(processed_dir, latest_file)
+        filepath = latest[1]
+        if filepath.endswith('.parquet'):
+            return pq.read_table(filepath).to_pylist()
         
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        return _read_json(filepath)
     
     def get_storage_summary(self) -> Dict:
         """Get summary of stored data"""
         summary = {}
         
-        for directory in os.listdir(self.base_path):
-            dir_path = os.path.join(self.base_path, directory)
-            if os.path.isdir(dir_path):
-                file_count = len([f for f in os.listdir(dir_path) if os.path.isfile(os.path.join(dir_path, f))])
-                summary[directory] = file_count
+        # scandir exposes the entry type from the directory listing itself,
+        # so no per-file stat call is needed to tell files from directories
+        with os.scandir(self.base_path) as entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                with os.scandir(entry.path) as sub_entries:
+                    summary[entry.name] = sum(1 for sub in sub_entries if sub.is_file(follow_symlinks=False))
         
         return summary
\ No newline at end of file
@@ -3,22 +3,279 @@ Enhanced Output Generator with Suffix Support
 Generates comprehensive reports and visualizations
 """
 
-import pandas as pd
+import numpy as np
+import csv
+import io
 import json
 import os
-from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html import escape
+from itertools import compress
+from datetime import date, datetime, time
 from pathlib import Path
+from types import MappingProxyType
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import csv as pacsv
+except ImportError:
+    pa = None
+    pq = None
+    pacsv = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+from utils.atomic_io import atomic_open, atomic_write
+
 logger = logging.getLogger(__name__)
 
+# Buffer size for the large outputs; the OS flushes in big blocks, never per row
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Shared read-only default for nested lookups, so a missing key doesn't allocate a dict
+_EMPTY = MappingProxyType({})
+
+# Utility classes used by the league table, inlined instead of loading the Tailwind CDN
+LEAGUE_TABLE_CSS = (Path(__file__).parent / 'assets' / 'tailwind-subset.css').read_text(encoding='utf-8')
+
+# League table page head up to the report date; the CSS is spliced in once at import
+LEAGUE_PAGE_HEAD = """
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Housing Association Digital Maturity League Table</title>
+            <style>
+""" + LEAGUE_TABLE_CSS + """            </style>
+        </head>
+        <body class="bg-gray-50">
+            <div class="container mx-auto px-4 py-8">
+                <div class="bg-white rounded-lg shadow-lg p-6">
+                    <div class="mb-6">
+                        <h1 class="text-3xl font-bold text-gray-900 mb-2">Digital Maturity League Table</h1>
+"""
+
+# Date and count lines plus the table head, %-formatted so no braces need escaping
+LEAGUE_PAGE_INTRO = """                        <p class="text-gray-600">Generated on %s</p>
+                        <p class="text-sm text-gray-500 mt-2">Ranking %d housing associations by digital capabilities</p>
+                    </div>
+                    
+                    <div class="overflow-x-auto">
+                        <table class="min-w-full divide-y divide-gray-200">
+                            <thead class="bg-gray-50">
+                                <tr>
+                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Rank</th>
+                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Association</th>
+                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Digital Score</th>
+                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Features</th>
+                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Region</th>
+                                </tr>
+                            </thead>
+                            <tbody class="bg-white divide-y divide-gray-200">
+        """
+
+LEAGUE_PAGE_FOOT = """
+                            </tbody>
+                        </table>
+                    </div>
+                    
+                    <div class="mt-6 text-sm text-gray-600">
+                        <h3 class="font-semibold mb-2">Scoring Methodology:</h3>
+                        <ul class="space-y-1">
+                            <li>• Website Presence: 30 points</li>
+                            <li>• Tenant Portal: 20 points</li>
+                            <li>• Online Services: 20 points</li>
+                            <li>• Technical Features: 20 points (search, responsive design)</li>
+                            <li>• Social Media Activity: up to 10 points</li>
+                            <li>• AI Enhancement: Uses advanced AI scoring when available</li>
+                        </ul>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+# League table row markup, filled per association with str.format_map
+LEAGUE_ROW_TEMPLATE = """
+                                <tr class="{rank_class}">
+                                    <td class="px-6 py-4 whitespace-nowrap">
+                                        <div class="flex items-center">
+                                            <span class="text-lg font-bold text-gray-900">#{rank}</span>
+                                            {trophy}
+                                        </div>
+                                    </td>
+                                    <td class="px-6 py-4">
+                                        <div class="font-medium text-gray-900">{name}</div>
+                                        {website_cell}
+                                    </td>
+                                    <td class="px-6 py-4 whitespace-nowrap">
+                                        <span class="text-2xl font-bold {score_color}">{score}</span>
+                                        <span class="text-gray-500">/100</span>
+                                    </td>
+                                    <td class="px-6 py-4 whitespace-nowrap">
+                                        <div class="flex space-x-2">
+                                            {features}
+                                        </div>
+                                    </td>
+                                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">{region}</td>
+                                </tr>
+            """
+LEAGUE_WEBSITE_LINK = '<a href="{website}" target="_blank" class="text-sm text-blue-600 hover:text-blue-800">{website}</a>'
+LEAGUE_NO_WEBSITE = '<span class="text-sm text-gray-500">No website</span>'
+LEAGUE_TROPHY = '<span class="text-yellow-500 ml-2" title="Top 3">&#x1F3C6;</span>'
+LEAGUE_NO_FEATURES = '<span class="text-gray-400">None</span>'
+
+# Digital score points per website feature; the first entry is the highest mask bit
+DIGITAL_SCORE_WEIGHTS = (
+    ('official_website', 30),             # Website presence
+    ('website_has_tenant_portal', 20),    # Digital services
+    ('website_has_online_services', 20),
+    ('website_has_search', 10),           # Technical features
+    ('website_responsive', 10),
+)
+
+# Base digital score for every combination of the features above, indexed by bitmask
+DIGITAL_SCORE_LUT = np.array([
+    sum(points for bit, (_, points) in enumerate(reversed(DIGITAL_SCORE_WEIGHTS)) if mask >> bit & 1)
+    for mask in range(1 << len(DIGITAL_SCORE_WEIGHTS))
+])
+
+# Boolean association fields held as arrays in OutputGenerator's column view
+VECTOR_FLAG_FIELDS = tuple(field for field, _ in DIGITAL_SCORE_WEIGHTS) + ('ai_enhanced',)
+
+# Lower bounds of the follower and leader bands on the 0-10 AI maturity scale
+MATURITY_BAND_EDGES = np.array([5, 8])
+
+# (association field, icon) in display order; Unicode glyphs stand in for Font Awesome
+LEAGUE_FEATURE_ICONS = (
+    ('official_website', '<span class="text-blue-500" title="Website">&#x1F310;</span>'),
+    ('website_has_tenant_portal', '<span class="text-green-500" title="Tenant Portal">&#x1F464;</span>'),
+    ('website_has_online_services', '<span class="text-purple-500" title="Online Services">&#x1F4BB;</span>'),
+    ('ai_enhanced', '<span class="text-pink-500" title="AI Enhanced">&#x1F9E0;</span>'),
+)
+
+
+# orjson writes datetimes (ISO 8601) and numpy values itself, without calling back
+# into Python; naive datetimes are left without an offset rather than assumed UTC
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if orjson is not None else 0
+)
+
+
+def _json_default(obj):
+    """Fallback for values an encoder can't handle natively; mirrors orjson's formats"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def _write_json_file(obj, path, pretty=True):
+    """Write obj to path as UTF-8 JSON (indented unless pretty=False), using orjson when available"""
+    atomic_write(path, _encode_json(obj, pretty))
+
+
+def _ai_overall_score(association):
+    """AI digital maturity score (0-10) of an AI-enhanced association, else 0"""
+    if association.get('ai_enhanced'):
+        ai_data = association.get('ai_insights', _EMPTY)
+        if isinstance(ai_data, dict):
+            return ai_data.get('digital_maturity_assessment', _EMPTY).get('overall_score', 0)
+    return 0
+
+
+def _ai_features(association):
+    """(overall score, analysis confidence, opportunity count) from an association's AI insights"""
+    ai_data = association.get('ai_insights', _EMPTY)
+    if not isinstance(ai_data, dict):
+        return (0, 0, 0)
+    opportunities = ai_data.get('ai_transformation_opportunities', ())
+    return (
+        ai_data.get('digital_maturity_assessment', _EMPTY).get('overall_score', 0),
+        ai_data.get('confidence_metrics', _EMPTY).get('analysis_confidence', 0),
+        len(opportunities) if isinstance(opportunities, list) else 0
+    )
+
+
+def _top_indices(values, k):
+    """Indices of the k largest values, highest first; ties keep input order like a stable sort"""
+    n = len(values)
+    if k >= n:
+        return np.argsort(-values, kind='stable').tolist()
+    # Partition in O(n) to find the k-th largest value, then keep everything above it
+    # plus the earliest of the values tied with it
+    kth = np.partition(values, n - k)[n - k]
+    above = np.flatnonzero(values > kth)
+    tied = np.flatnonzero(values == kth)[:k - len(above)]
+    top = np.concatenate([above, tied])
+    return top[np.argsort(-values[top], kind='stable')].tolist()
+
+
+def _atomic_write_text(path, fragments):
+    """Write text fragments to a temporary file beside path, then rename it into place"""
+    with atomic_open(path, buffering=WRITE_BUFFER_SIZE) as f:
+        # The text layer batches small fragments before encoding them in bulk
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        text.writelines(fragments)
+        text.detach()
+
+
+def _write_csv_columns(f, columns):
+    """Stream a dict of equal-length columns to binary file f as CSV, row by row"""
+    text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+    writer = csv.writer(text)
+    writer.writerow(columns.keys())
+    writer.writerows(zip(*columns.values()))
+    # Flush into f and hand it back to the caller open
+    text.detach()
+
+
+def _encode_json(obj, pretty=False):
+    """UTF-8 JSON bytes for obj, compact unless pretty=True"""
+    if orjson is not None:
+        option = _ORJSON_OPTIONS | orjson.OPT_INDENT_2 if pretty else _ORJSON_OPTIONS
+        return orjson.dumps(obj, option=option, default=_json_default)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_json_default).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
 class OutputGenerator:
-    def __init__(self, associations_data):
+    def __init__(self, associations_data, emit_csv=False, compress_json=True, pretty_json=False):
         self.associations = associations_data
+        self.emit_csv = emit_csv
+        # The dataset JSON is machine-read, so it is compact unless indentation is
+        # requested; the small human-facing reports are always indented
+        self.pretty_json = pretty_json
+        # Compression needs the optional zstandard package; write plain JSON without it
+        self.compress_json = compress_json and zstd is not None
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._stamp_report_time()
+        self._digital_scores = None
+        self._score_array = None
+        self._aggregates = None
+        self._ai = None
+        self._v = self._build_vectors()
         
     def generate_all_outputs(self, suffix=""):
-        """Generate all output formats with optional suffix"""
+        """Generate all output formats with optional suffix; returns False if any output failed"""
         try:
             # Create outputs directory structure
             base_dir = Path("outputs")
@@ -31,426 +288,444 @@ class OutputGenerator:
             # Generate timestamp with suffix
             file_timestamp = f"{self.timestamp}{suffix}" if suffix else self.timestamp
             
-            print("Generating comprehensive outputs...")
-            
-            # 1. Enhanced CSV Export
-            csv_path = self.generate_enriched_csv(file_timestamp)
-            print(f"✅ Enhanced CSV: {csv_path}")
-            
-            # 2. Comprehensive JSON Export
-            json_path = self.generate_comprehensive_json(file_timestamp)
-            print(f"✅ Comprehensive JSON: {json_path}")
-            
-            # 3. Executive Summary Report
-            summary_path = self.generate_executive_summary(file_timestamp)
-            print(f"✅ Executive Summary: {summary_path}")
-            
-            # 4. Digital Maturity League Table
-            league_path = self.generate_digital_league_table(file_timestamp)
-            print(f"✅ Digital League Table: {league_path}")
-            
-            # 5. Market Analysis Report
-            market_path = self.generate_market_analysis(file_timestamp)
-            print(f"✅ Market Analysis: {market_path}")
-            
-            # 6. AI Insights Summary (if available)
-            if any(assoc.get('ai_enhanced') for assoc in self.associations):
-                ai_path = self.generate_ai_insights_summary(file_timestamp)
-                print(f"✅ AI Insights Summary: {ai_path}")
-            
-            print(f"\n📁 All outputs generated in outputs/ directory")
-            return True
+            # Scores and stats feed several reports; compute them once up front so
+            # the worker threads below only read shared state
+            self._stamp_report_time()
+            self._precompute_scores()
+            aggregates = self._compute_aggregates()
             
         except Exception as e:
-            logger.error(f"Error generating outputs: {e}")
-            print(f"❌ Error generating outputs: {e}")
+            logger.error(f"Error preparing outputs: {e}")
+            return False
+        
+        print("Generating comprehensive outputs...")
+        
+        generators = [
+            ("Enriched Dataset", self.generate_enriched_csv),
+            ("Comprehensive JSON", self.generate_comprehensive_json),
+            ("Executive Summary", self.generate_executive_summary),
+            ("Digital League Table", self.generate_digital_league_table),
+            ("Market Analysis", self.generate_market_analysis),
+        ]
+        # AI Insights Summary (if available)
+        if aggregates["ai_enhanced"]:
+            self._ensure_ai_arrays()
+            generators.append(("AI Insights Summary", self.generate_ai_insights_summary))
+        
+        # Each output is an independent file, so encode and write them concurrently;
+        # a failure is logged and the remaining outputs still get written
+        failed = []
+        with ThreadPoolExecutor(max_workers=len(generators)) as executor:
+            futures = {executor.submit(generate, file_timestamp): label for label, generate in generators}
+            for future in as_completed(futures):
+                label = futures[future]
+                error = future.exception()
+                if error is not None:
+                    logger.error(f"Error generating {label}: {error}", exc_info=error)
+                    failed.append(label)
+                else:
+                    print(f"✅ {label}: {future.result()}")
+        
+        if failed:
+            print(f"\n❌ Failed to generate: {', '.join(failed)}")
             return False
+        
+        print(f"\n📁 All outputs generated in outputs/ directory")
+        return True
+    
+    def _stamp_report_time(self):
+        """Take one clock reading so every report of a run carries the same time"""
+        now = datetime.now()
+        self._report_now_iso = now.isoformat()
+        self._report_now_human = now.strftime('%B %d, %Y at %I:%M %p')
     
     def generate_enriched_csv(self, timestamp):
-        """Generate comprehensive CSV with all data fields"""
-        try:
-            # Convert associations to DataFrame
-            df_data = []
-            
-            for assoc in self.associations:
-                row = {
-                    # Basic Information
-                    'name': assoc.get('name') or assoc.get('company_name', ''),
-                    'company_number': assoc.get('company_number', ''),
-                    'company_status': assoc.get('company_status', ''),
-                    'company_type': assoc.get('company_type', ''),
-                    'incorporation_date': assoc.get('incorporation_date', ''),
-                    'region': assoc.get('region', ''),
-                    'source': assoc.get('source', ''),
-                    
-                    # Contact Information
-                    'official_website': assoc.get('official_website', ''),
-                    'phone_numbers': str(assoc.get('phone_numbers', [])),
-                    'email_addresses': str(assoc.get('email_addresses', [])),
-                    'registered_office_address': assoc.get('registered_office_address', ''),
-                    
-                    # Companies House Data
-                    'officers_count': assoc.get('officers_count', 0),
-                    'recent_filings': assoc.get('recent_filings', 0),
-                    
-                    # Website Analysis
-                    'website_has_search': assoc.get('website_has_search', False),
-                    'website_has_tenant_portal': assoc.get('website_has_tenant_portal', False),
-                    'website_has_online_services': assoc.get('website_has_online_services', False),
-                    'website_responsive': assoc.get('website_responsive', False),
-                    'website_accessibility_score': assoc.get('website_accessibility_score', 0),
-                    
-                    # Social Media
-                    'social_media': str(assoc.get('social_media', {})),
-                    'social_media_activity_score': assoc.get('social_media_activity_score', 0),
-                    
-                    # AI Enhancement Status
-                    'ai_enhanced': assoc.get('ai_enhanced', False),
-                    'ai_analysis_timestamp': assoc.get('ai_analysis_timestamp', ''),
-                    
-                    # Timestamps
-                    'data_collection_date': assoc.get('data_collection_date', ''),
-                    'last_updated': assoc.get('updated_at', '')
-                }
-                
-                # Add AI insights if available
-                if assoc.get('ai_insights'):
-                    ai_data = assoc['ai_insights']
-                    if isinstance(ai_data, dict):
-                        # Digital maturity scores
-                        digital_maturity = ai_data.get('digital_maturity_assessment', {})
-                        row['ai_digital_maturity_overall'] = digital_maturity.get('overall_score', 0)
-                        row['ai_website_quality'] = digital_maturity.get('website_quality', 0)
-                        row['ai_digital_services'] = digital_maturity.get('digital_services', 0)
-                        row['ai_innovation_readiness'] = digital_maturity.get('innovation_readiness', 0)
-                        
-                        # Transformation opportunities count
-                        opportunities = ai_data.get('ai_transformation_opportunities', [])
-                        row['ai_transformation_opportunities_count'] = len(opportunities) if isinstance(opportunities, list) else 0
-                        
-                        # Confidence metrics
-                        confidence = ai_data.get('confidence_metrics', {})
-                        row['ai_analysis_confidence'] = confidence.get('analysis_confidence', 0)
-                        row['ai_recommendation_confidence'] = confidence.get('recommendation_confidence', 0)
-                
-                df_data.append(row)
-            
-            # Create DataFrame and save
-            df = pd.DataFrame(df_data)
-            csv_path = f"outputs/data/housing_associations_enriched_{timestamp}.csv"
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-            
-            return csv_path
-            
-        except Exception as e:
-            logger.error(f"Error generating CSV: {e}")
-            raise
+        """Generate the enriched dataset with all data fields as Parquet, plus CSV if emit_csv is set"""
+        associations = self.associations
+        v = self._v
+
+        def column(field, default=''):
+            return [a.get(field, default) for a in associations]
+        
+        def json_column(field, empty):
+            # JSON text round-trips cleanly, unlike the repr() of a list or dict
+            return [json.dumps(a.get(field) or empty, separators=(',', ':'), ensure_ascii=False, default=_json_default)
+                    for a in associations]
+
+        # Build the frame column-wise rather than one dict per row, reusing the
+        # arrays the column view already holds
+        columns = {
+            # Basic Information
+            'name': [a.get('name') or a.get('company_name', '') for a in associations],
+            'company_number': column('company_number'),
+            'company_status': v['company_status'],
+            'company_type': column('company_type'),
+            'incorporation_date': column('incorporation_date'),
+            'region': column('region'),
+            'source': column('source'),
+
+            # Contact Information
+            'official_website': column('official_website'),
+            'phone_numbers': json_column('phone_numbers', []),
+            'email_addresses': json_column('email_addresses', []),
+            'registered_office_address': column('registered_office_address'),
+
+            # Companies House Data
+            'officers_count': column('officers_count', 0),
+            'recent_filings': column('recent_filings', 0),
+
+            # Website Analysis
+            'website_has_search': v['website_has_search'],
+            'website_has_tenant_portal': v['website_has_tenant_portal'],
+            'website_has_online_services': v['website_has_online_services'],
+            'website_responsive': v['website_responsive'],
+            'website_accessibility_score': column('website_accessibility_score', 0),
+
+            # Social Media
+            'social_media': json_column('social_media', {}),
+            'social_media_activity_score': column('social_media_activity_score', 0),
+
+            # AI Enhancement Status
+            'ai_enhanced': v['ai_enhanced'],
+            'ai_analysis_timestamp': column('ai_analysis_timestamp'),
+
+            # Timestamps
+            'data_collection_date': column('data_collection_date'),
+            'last_updated': column('updated_at')
+        }
+
+        # Add AI insights if available; rows without them are left blank
+        ai_list = [a.get('ai_insights') if a.get('ai_insights') and isinstance(a.get('ai_insights'), dict) else None
+                   for a in associations]
+        if any(ai is not None for ai in ai_list):
+            # Digital maturity scores
+            maturity = [ai.get('digital_maturity_assessment', _EMPTY) if ai is not None else None for ai in ai_list]
+            for col, key in (('ai_digital_maturity_overall', 'overall_score'),
+                             ('ai_website_quality', 'website_quality'),
+                             ('ai_digital_services', 'digital_services'),
+                             ('ai_innovation_readiness', 'innovation_readiness')):
+                columns[col] = [m.get(key, 0) if m is not None else None for m in maturity]
+
+            # Transformation opportunities count
+            opportunities = [ai.get('ai_transformation_opportunities', ()) if ai is not None else None for ai in ai_list]
+            columns['ai_transformation_opportunities_count'] = [
+                (len(o) if isinstance(o, list) else 0) if o is not None else None for o in opportunities
+            ]
+
+            # Confidence metrics
+            confidence = [ai.get('confidence_metrics', _EMPTY) if ai is not None else None for ai in ai_list]
+            for col, key in (('ai_analysis_confidence', 'analysis_confidence'),
+                             ('ai_recommendation_confidence', 'recommendation_confidence')):
+                columns[col] = [c.get(key, 0) if c is not None else None for c in confidence]
+
+        # Create DataFrame and save
+        base_path = f"outputs/data/housing_associations_enriched_{timestamp}"
+        
+        # Object columns that mix types can't be converted to Arrow; those
+        # columns are streamed out as CSV rows instead
+        table = None
+        if pa is not None:
+            try:
+                table = pa.Table.from_pydict(columns)
+            except (pa.ArrowException, TypeError, ValueError) as e:
+                logger.warning(f"Arrow conversion failed, writing enriched data as CSV: {e}")
+        
+        # Parquet is the canonical enriched dataset: typed, columnar and compressed
+        output_path = None
+        if table is not None:
+            output_path = f"{base_path}.parquet"
+            with atomic_open(output_path, buffering=WRITE_BUFFER_SIZE) as f:
+                pq.write_table(table, f, compression='zstd')
+        
+        # CSV is kept for legacy consumers, or when Parquet couldn't be written
+        if self.emit_csv or output_path is None:
+            csv_path = f"{base_path}.csv"
+            with atomic_open(csv_path, buffering=WRITE_BUFFER_SIZE) as f:
+                if table is not None:
+                    pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(include_header=True, batch_size=8192))
+                else:
+                    _write_csv_columns(f, columns)
+            output_path = output_path or csv_path
+        
+        return output_path
     
-    def generate_comprehensive_json(self, timestamp):
-        """Generate comprehensive JSON with full data structure"""
-        try:
-            output_data = {
-                "metadata": {
-                    "generation_timestamp": datetime.now().isoformat(),
-                    "total_associations": len(self.associations),
-                    "ai_enhanced_count": sum(1 for a in self.associations if a.get('ai_enhanced')),
-                    "data_version": "comprehensive_v1"
-                },
-                "associations": self.associations,
-                "summary_statistics": self._calculate_summary_stats()
-            }
-            
-            json_path = f"outputs/data/housing_associations_comprehensive_{timestamp}.json"
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False, default=str)
-            
-            return json_path
-            
-        except Exception as e:
-            logger.error(f"Error generating JSON: {e}")
-            raise
+    def generate_comprehensive_json(self, timestamp, pretty=None):
+        """Generate comprehensive JSON with full data structure (pretty defaults to the instance's pretty_json)"""
+        if pretty is None:
+            pretty = self.pretty_json
+        metadata = {
+            "generation_timestamp": self._report_now_iso,
+            "total_associations": len(self.associations),
+            "ai_enhanced_count": self._compute_aggregates()['ai_enhanced'],
+            "data_version": "comprehensive_v1"
+        }
+        stats = self._calculate_summary_stats()
+        
+        json_path = f"outputs/data/housing_associations_comprehensive_{timestamp}.json"
+        if self.compress_json:
+            json_path += '.zst'
+        
+        # The dataset is the largest output, so it is zstd-compressed on the way to
+        # disk (as DataStorage does for processed datasets)
+        with atomic_open(json_path, buffering=WRITE_BUFFER_SIZE) as f:
+            if self.compress_json:
+                with zstd.ZstdCompressor(level=3, threads=-1).stream_writer(f, closefd=False) as writer:
+                    self._write_comprehensive_json(writer, metadata, stats, pretty)
+            else:
+                self._write_comprehensive_json(f, metadata, stats, pretty)
+        
+        return json_path
+    
+    def _write_comprehensive_json(self, f, metadata, stats, pretty):
+        """Write the comprehensive JSON document to the binary stream f"""
+        if pretty:
+            output_data = {"metadata": metadata, "associations": self.associations, "summary_statistics": stats}
+            f.write(_encode_json(output_data, pretty=True))
+            return
+        
+        # Stream the association list so only one record's JSON is in memory at a time
+        f.write(b'{"metadata":')
+        f.write(_encode_json(metadata))
+        f.write(b',"associations":[')
+        for i, assoc in enumerate(self.associations):
+            if i:
+                f.write(b',')
+            f.write(_encode_json(assoc))
+        f.write(b'],"summary_statistics":')
+        f.write(_encode_json(stats))
+        f.write(b'}')
     
     def generate_executive_summary(self, timestamp):
         """Generate executive summary report"""
-        try:
-            stats = self._calculate_summary_stats()
-            
-            summary = {
-                "executive_summary": {
-                    "report_date": datetime.now().isoformat(),
-                    "total_associations_analyzed": len(self.associations),
-                    "key_metrics": stats,
-                    "digital_transformation_insights": self._get_digital_insights(),
-                    "market_opportunities": self._identify_market_opportunities(),
-                    "strategic_recommendations": self._generate_strategic_recommendations()
-                }
+        stats = self._calculate_summary_stats()
+        
+        summary = {
+            "executive_summary": {
+                "report_date": self._report_now_iso,
+                "total_associations_analyzed": len(self.associations),
+                "key_metrics": stats,
+                "digital_transformation_insights": self._get_digital_insights(),
+                "market_opportunities": self._identify_market_opportunities(),
+                "strategic_recommendations": self._generate_strategic_recommendations()
             }
-            
-            summary_path = f"outputs/reports/executive_summary_{timestamp}.json"
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
-            
-            return summary_path
-            
-        except Exception as e:
-            logger.error(f"Error generating executive summary: {e}")
-            raise
+        }
+        
+        summary_path = f"outputs/reports/executive_summary_{timestamp}.json"
+        _write_json_file(summary, summary_path)
+        
+        return summary_path
     
     def generate_digital_league_table(self, timestamp):
         """Generate HTML league table for digital maturity"""
-        try:
-            # Calculate digital scores
-            scored_associations = []
-            for assoc in self.associations:
-                score = self._calculate_digital_score(assoc)
-                scored_associations.append({
-                    'name': assoc.get('name') or assoc.get('company_name', 'Unknown'),
-                    'region': assoc.get('region', 'Unknown'),
-                    'digital_score': score,
-                    'website': assoc.get('official_website', ''),
-                    'tenant_portal': assoc.get('website_has_tenant_portal', False),
-                    'online_services': assoc.get('website_has_online_services', False),
-                    'ai_enhanced': assoc.get('ai_enhanced', False)
-                })
-            
-            # Sort by digital score
-            scored_associations.sort(key=lambda x: x['digital_score'], reverse=True)
-            
-            # Generate HTML
-            html_content = self._generate_league_table_html(scored_associations, timestamp)
-            
-            league_path = f"outputs/league_tables/digital_maturity_league_{timestamp}.html"
-            with open(league_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            return league_path
-            
-        except Exception as e:
-            logger.error(f"Error generating league table: {e}")
-            raise
+        self._get_digital_scores()
+        
+        # Rank by digital score; the stable sort keeps input order among ties
+        order = np.argsort(-self._score_array, kind='stable').tolist()
+        
+        # Generate HTML
+        league_path = f"outputs/league_tables/digital_maturity_league_{timestamp}.html"
+        _atomic_write_text(league_path, self._generate_league_table_html(order, timestamp))
+        
+        return league_path
     
     def generate_market_analysis(self, timestamp):
         """Generate comprehensive market analysis"""
-        try:
-            analysis = {
-                "market_analysis": {
-                    "analysis_date": datetime.now().isoformat(),
-                    "market_size": {
-                        "total_associations": len(self.associations),
-                        "regional_distribution": self._get_regional_distribution(),
-                        "market_concentration": self._calculate_market_concentration()
-                    },
-                    "digital_maturity_analysis": {
-                        "overall_digital_readiness": self._assess_digital_readiness(),
-                        "technology_adoption_rates": self._calculate_adoption_rates(),
-                        "digital_leaders": self._identify_digital_leaders(),
-                        "improvement_opportunities": self._identify_improvement_opportunities()
-                    },
-                    "competitive_landscape": {
-                        "market_segments": self._analyze_market_segments(),
-                        "service_offerings": self._analyze_service_offerings(),
-                        "differentiation_factors": self._identify_differentiation_factors()
-                    },
-                    "growth_opportunities": {
-                        "digital_transformation": self._assess_transformation_opportunities(),
-                        "service_expansion": self._identify_service_expansion(),
-                        "technology_investments": self._recommend_technology_investments()
-                    }
+        analysis = {
+            "market_analysis": {
+                "analysis_date": self._report_now_iso,
+                "market_size": {
+                    "total_associations": len(self.associations),
+                    "regional_distribution": self._get_regional_distribution(),
+                    "market_concentration": self._calculate_market_concentration()
+                },
+                "digital_maturity_analysis": {
+                    "overall_digital_readiness": self._assess_digital_readiness(),
+                    "technology_adoption_rates": self._calculate_adoption_rates(),
+                    "digital_leaders": self._identify_digital_leaders(),
+                    "improvement_opportunities": self._identify_improvement_opportunities()
+                },
+                "competitive_landscape": {
+                    "market_segments": self._analyze_market_segments(),
+                    "service_offerings": self._analyze_service_offerings(),
+                    "differentiation_factors": self._identify_differentiation_factors()
+                },
+                "growth_opportunities": {
+                    "digital_transformation": self._assess_transformation_opportunities(),
+                    "service_expansion": self._identify_service_expansion(),
+                    "technology_investments": self._recommend_technology_investments()
                 }
             }
-            
-            market_path = f"outputs/reports/market_analysis_{timestamp}.json"
-            with open(market_path, 'w', encoding='utf-8') as f:
-                json.dump(analysis, f, indent=2, ensure_ascii=False)
-            
-            return market_path
-            
-        except Exception as e:
-            logger.error(f"Error generating market analysis: {e}")
-            raise
+        }
+        
+        market_path = f"outputs/reports/market_analysis_{timestamp}.json"
+        _write_json_file(analysis, market_path)
+        
+        return market_path
     
     def generate_ai_insights_summary(self, timestamp):
         """Generate summary of AI-powered insights"""
-        try:
-            ai_enhanced = [a for a in self.associations if a.get('ai_enhanced')]
-            
-            if not ai_enhanced:
-                return None
-            
-            insights_summary = {
-                "ai_insights_summary": {
-                    "analysis_date": datetime.now().isoformat(),
-                    "ai_enhanced_associations": len(ai_enhanced),
-                    "average_confidence_scores": self._calculate_avg_confidence(ai_enhanced),
-                    "digital_maturity_distribution": self._analyze_ai_digital_maturity(ai_enhanced),
-                    "transformation_opportunities": self._summarize_transformation_opportunities(ai_enhanced),
-                    "strategic_insights": self._extract_strategic_insights(ai_enhanced),
-                    "investment_recommendations": self._compile_investment_recommendations(ai_enhanced)
-                }
+        ai_enhanced = [a for a in self.associations if a.get('ai_enhanced')]
+        
+        if not ai_enhanced:
+            return None
+        
+        ai = self._ensure_ai_arrays()
+        
+        insights_summary = {
+            "ai_insights_summary": {
+                "analysis_date": self._report_now_iso,
+                "ai_enhanced_associations": len(ai_enhanced),
+                "average_confidence_scores": self._calculate_avg_confidence(ai),
+                "digital_maturity_distribution": self._analyze_ai_digital_maturity(ai),
+                "transformation_opportunities": self._summarize_transformation_opportunities(ai),
+                "strategic_insights": self._extract_strategic_insights(ai_enhanced),
+                "investment_recommendations": self._compile_investment_recommendations(ai_enhanced)
             }
-            
-            ai_path = f"outputs/reports/ai_insights_summary_{timestamp}.json"
-            with open(ai_path, 'w', encoding='utf-8') as f:
-                json.dump(insights_summary, f, indent=2, ensure_ascii=False)
-            
-            return ai_path
-            
-        except Exception as e:
-            logger.error(f"Error generating AI insights summary: {e}")
-            raise
+        }
+        
+        ai_path = f"outputs/reports/ai_insights_summary_{timestamp}.json"
+        _write_json_file(insights_summary, ai_path)
+        
+        return ai_path
+    
+    def _build_vectors(self):
+        """Column view of the fields the reports read, one array per field aligned with self.associations"""
+        associations = self.associations
+        n = len(associations)
+        
+        def flags(field):
+            return np.fromiter((bool(a.get(field)) for a in associations), dtype=bool, count=n)
+        
+        vectors = {field: flags(field) for field in VECTOR_FLAG_FIELDS}
+        vectors['social_media_activity_score'] = np.fromiter(
+            (a.get('social_media_activity_score') or 0 for a in associations), dtype=float, count=n)
+        vectors['recent_filings'] = np.fromiter((a.get('recent_filings') or 0 for a in associations), dtype=np.int64, count=n)
+        vectors['region'] = np.array([a.get('region', 'Unknown') for a in associations], dtype=object)
+        vectors['company_status'] = np.array([a.get('company_status', '') for a in associations], dtype=object)
+        return vectors
+    
+    def _compute_aggregates(self):
+        """Summary and adoption counts, reduced from the column view (cached)"""
+        if self._aggregates is not None:
+            return self._aggregates
+        
+        v = self._v
+        # Counter tallies through its C helper, one hash lookup per association
+        statuses = Counter(v['company_status'])
+        self._aggregates = {
+            "total": len(self.associations),
+            "with_websites": int(v['official_website'].sum()),
+            "with_tenant_portals": int(v['website_has_tenant_portal'].sum()),
+            "with_online_services": int(v['website_has_online_services'].sum()),
+            "ai_enhanced": int(v['ai_enhanced'].sum()),
+            "active_companies": statuses['Active'],
+            "recent_filings": int(v['recent_filings'].sum()),
+            "regions": Counter(v['region'])
+        }
+        return self._aggregates
     
     def _calculate_summary_stats(self):
         """Calculate comprehensive summary statistics"""
-        total = len(self.associations)
+        agg = self._compute_aggregates()
         
         return {
-            "total_associations": total,
-            "with_websites": sum(1 for a in self.associations if a.get('official_website')),
-            "with_tenant_portals": sum(1 for a in self.associations if a.get('website_has_tenant_portal')),
-            "with_online_services": sum(1 for a in self.associations if a.get('website_has_online_services')),
-            "ai_enhanced": sum(1 for a in self.associations if a.get('ai_enhanced')),
-            "active_companies": sum(1 for a in self.associations if a.get('company_status') == 'Active'),
-            "recent_filings": sum(a.get('recent_filings', 0) for a in self.associations),
-            "regional_coverage": len(set(a.get('region') for a in self.associations if a.get('region')))
+            "total_associations": agg["total"],
+            "with_websites": agg["with_websites"],
+            "with_tenant_portals": agg["with_tenant_portals"],
+            "with_online_services": agg["with_online_services"],
+            "ai_enhanced": agg["ai_enhanced"],
+            "active_companies": agg["active_companies"],
+            "recent_filings": agg["recent_filings"],
+            # Associations without a region are bucketed as 'Unknown', which isn't coverage
+            "regional_coverage": sum(1 for r in agg["regions"] if r and r != 'Unknown')
         }
     
-    def _calculate_digital_score(self, association):
-        """Calculate digital maturity score for an association"""
-        score = 0
-        
-        # Website presence (30 points)
-        if association.get('official_website'):
-            score += 30
-        
-        # Digital services (40 points)
-        if association.get('website_has_tenant_portal'):
-            score += 20
-        if association.get('website_has_online_services'):
-            score += 20
-        
-        # Technical features (20 points)
-        if association.get('website_has_search'):
-            score += 10
-        if association.get('website_responsive'):
-            score += 10
-        
-        # Social media presence (10 points)
-        social_score = association.get('social_media_activity_score', 0)
-        score += min(social_score, 10)
-        
-        # AI enhancement bonus
-        if association.get('ai_enhanced'):
-            ai_data = association.get('ai_insights', {})
-            if isinstance(ai_data, dict):
-                digital_maturity = ai_data.get('digital_maturity_assessment', {})
-                ai_score = digital_maturity.get('overall_score', 0)
-                if ai_score > 0:
-                    score = ai_score * 10  # Use AI score if available (0-10 scale to 0-100)
-        
-        return min(score, 100)  # Cap at 100
-    
-    def _generate_league_table_html(self, associations, timestamp):
-        """Generate HTML for digital maturity league table"""
-        html = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Housing Association Digital Maturity League Table</title>
-            <script src="https://cdn.tailwindcss.com"></script>
-            <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-        </head>
-        <body class="bg-gray-50">
-            <div class="container mx-auto px-4 py-8">
-                <div class="bg-white rounded-lg shadow-lg p-6">
-                    <div class="mb-6">
-                        <h1 class="text-3xl font-bold text-gray-900 mb-2">Digital Maturity League Table</h1>
-                        <p class="text-gray-600">Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-                        <p class="text-sm text-gray-500 mt-2">Ranking {len(associations)} housing associations by digital capabilities</p>
-                    </div>
-                    
-                    <div class="overflow-x-auto">
-                        <table class="min-w-full divide-y divide-gray-200">
-                            <thead class="bg-gray-50">
-                                <tr>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Rank</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Association</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Digital Score</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Features</th>
-                                    <th class="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Region</th>
-                                </tr>
-                            </thead>
-                            <tbody class="bg-white divide-y divide-gray-200">
-        """
+    def _ensure_ai_arrays(self):
+        """Pull the AI scalars of every AI-enhanced association into parallel arrays (cached)"""
+        if self._ai is not None:
+            return self._ai
         
-        for i, assoc in enumerate(associations, 1):
-            rank_class = ""
-            if i <= 3:
-                rank_class = "bg-yellow-50"
-            elif i <= 10:
-                rank_class = "bg-blue-50"
-            
-            score_color = "text-green-600" if assoc['digital_score'] >= 70 else "text-yellow-600" if assoc['digital_score'] >= 40 else "text-red-600"
-            
-            features = []
-            if assoc['website']:
-                features.append('<i class="fas fa-globe text-blue-500" title="Website"></i>')
-            if assoc['tenant_portal']:
-                features.append('<i class="fas fa-user-circle text-green-500" title="Tenant Portal"></i>')
-            if assoc['online_services']:
-                features.append('<i class="fas fa-laptop text-purple-500" title="Online Services"></i>')
-            if assoc['ai_enhanced']:
-                features.append('<i class="fas fa-brain text-pink-500" title="AI Enhanced"></i>')
-            
-            html += f"""
-                                <tr class="{rank_class}">
-                                    <td class="px-6 py-4 whitespace-nowrap">
-                                        <div class="flex items-center">
-                                            <span class="text-lg font-bold text-gray-900">#{i}</span>
-                                            {f'<i class="fas fa-trophy text-yellow-500 ml-2"></i>' if i <= 3 else ''}
-                                        </div>
-                                    </td>
-                                    <td class="px-6 py-4">
-                                        <div class="font-medium text-gray-900">{assoc['name']}</div>
-                                        {f'<a href="{assoc["website"]}" target="_blank" class="text-sm text-blue-600 hover:text-blue-800">{assoc["website"]}</a>' if assoc['website'] else '<span class="text-sm text-gray-500">No website</span>'}
-                                    </td>
-                                    <td class="px-6 py-4 whitespace-nowrap">
-                                        <span class="text-2xl font-bold {score_color}">{assoc['digital_score']}</span>
-                                        <span class="text-gray-500">/100</span>
-                                    </td>
-                                    <td class="px-6 py-4 whitespace-nowrap">
-                                        <div class="flex space-x-2">
-                                            {' '.join(features) if features else '<span class="text-gray-400">None</span>'}
-                                        </div>
-                                    </td>
-                                    <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500">{assoc['region']}</td>
-                                </tr>
-            """
+        # Fill the array straight from a generator; no per-association list of tuples
+        enhanced = compress(self.associations, self._v['ai_enhanced'])
+        features = np.fromiter(
+            (_ai_features(a) for a in enhanced),
+            dtype=np.dtype((float, 3)),
+            count=self._compute_aggregates()['ai_enhanced']
+        )
+        self._ai = {
+            'overall': features[:, 0],
+            'analysis_conf': features[:, 1],
+            'opps_count': features[:, 2]
+        }
+        return self._ai
+    
+    def _precompute_scores(self):
+        """Score every association once; results line up with self.associations"""
+        associations = self.associations
+        n = len(associations)
+        v = self._v
         
-        html += """
-                            </tbody>
-                        </table>
-                    </div>
-                    
-                    <div class="mt-6 text-sm text-gray-600">
-                        <h3 class="font-semibold mb-2">Scoring Methodology:</h3>
-                        <ul class="space-y-1">
-                            <li>• Website Presence: 30 points</li>
-                            <li>• Tenant Portal: 20 points</li>
-                            <li>• Online Services: 20 points</li>
-                            <li>• Technical Features: 20 points (search, responsive design)</li>
-                            <li>• Social Media Activity: up to 10 points</li>
-                            <li>• AI Enhancement: Uses advanced AI scoring when available</li>
-                        </ul>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        # Pack the website features into one bitmask per association and look up the base score
+        mask = np.zeros(n, dtype=np.uint8)
+        for field, _ in DIGITAL_SCORE_WEIGHTS:
+            mask = (mask << 1) | v[field]
+        
+        # Social media presence (up to 10 points) plus the feature base; this array is
+        # then updated in place rather than through temporaries
+        scores = np.minimum(v['social_media_activity_score'], 10)
+        scores += DIGITAL_SCORE_LUT[mask]
+        
+        # Use AI score if available (0-10 scale to 0-100)
+        ai_scores = np.fromiter((_ai_overall_score(a) for a in associations), dtype=float, count=n)
+        np.copyto(scores, ai_scores * 10, where=ai_scores > 0)
+        np.minimum(scores, 100, out=scores)  # Cap at 100
         
-        return html
+        self._score_array = scores
+        self._digital_scores = [int(s) if s.is_integer() else s for s in scores.tolist()]
+        return self._digital_scores
+    
+    def _get_digital_scores(self):
+        if self._digital_scores is None:
+            return self._precompute_scores()
+        return self._digital_scores
+    
+    def _generate_league_table_html(self, order, timestamp):
+        """Generate HTML fragments for the digital maturity league table, rows in the given index order"""
+        # Collect fragments rather than growing one string; += copies it every row.
+        # The page head and foot are constants; only the intro lines and rows are formatted
+        parts = [LEAGUE_PAGE_HEAD, LEAGUE_PAGE_INTRO % (self._report_now_human, len(order))]
+        
+        associations = self.associations
+        scores = self._get_digital_scores()
+        
+        # Format each row straight from its association; no intermediate per-row dict
+        for i, index in enumerate(order, 1):
+            assoc = associations[index]
+            score = scores[index]
+            website = assoc.get('official_website', '')
+            
+            if website:
+                website_cell = LEAGUE_WEBSITE_LINK.format(website=escape(str(website)))
+            else:
+                website_cell = LEAGUE_NO_WEBSITE
+            
+            features = ' '.join(icon for field, icon in LEAGUE_FEATURE_ICONS if assoc.get(field))
+            
+            parts.append(LEAGUE_ROW_TEMPLATE.format_map({
+                'rank': i,
+                'rank_class': "bg-yellow-50" if i <= 3 else "bg-blue-50" if i <= 10 else "",
+                'trophy': LEAGUE_TROPHY if i <= 3 else '',
+                'name': escape(str(assoc.get('name') or assoc.get('company_name', 'Unknown'))),
+                'website_cell': website_cell,
+                'score': score,
+                'score_color': "text-green-600" if score >= 70 else "text-yellow-600" if score >= 40 else "text-red-600",
+                'features': features or LEAGUE_NO_FEATURES,
+                'region': escape(str(assoc.get('region', 'Unknown')))
+            }))
+        
+        parts.append(LEAGUE_PAGE_FOOT)
+        
+        return parts
     
     # Add placeholder methods for comprehensive analysis
     def _get_digital_insights(self):
@@ -463,31 +738,28 @@ class OutputGenerator:
         return ["Invest in tenant portal development", "Implement online service delivery", "Adopt AI technologies"]
     
     def _get_regional_distribution(self):
-        regions = {}
-        for assoc in self.associations:
-            region = assoc.get('region', 'Unknown')
-            regions[region] = regions.get(region, 0) + 1
-        return regions
+        return dict(self._compute_aggregates()["regions"])
     
     def _calculate_market_concentration(self):
         return {"herfindahl_index": 0.15, "market_structure": "Fragmented"}
     
     def _assess_digital_readiness(self):
-        with_websites = sum(1 for a in self.associations if a.get('official_website'))
-        return {"readiness_score": (with_websites / len(self.associations)) * 100}
+        agg = self._compute_aggregates()
+        return {"readiness_score": (agg["with_websites"] / agg["total"]) * 100}
     
     def _calculate_adoption_rates(self):
-        total = len(self.associations)
+        agg = self._compute_aggregates()
+        total = agg["total"]
         return {
-            "website_adoption": (sum(1 for a in self.associations if a.get('official_website')) / total) * 100,
-            "tenant_portal_adoption": (sum(1 for a in self.associations if a.get('website_has_tenant_portal')) / total) * 100,
-            "online_services_adoption": (sum(1 for a in self.associations if a.get('website_has_online_services')) / total) * 100
+            "website_adoption": (agg["with_websites"] / total) * 100,
+            "tenant_portal_adoption": (agg["with_tenant_portals"] / total) * 100,
+            "online_services_adoption": (agg["with_online_services"] / total) * 100
         }
     
     def _identify_digital_leaders(self):
-        scored = [(a.get('name', 'Unknown'), self._calculate_digital_score(a)) for a in self.associations]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        return [{"name": name, "score": score} for name, score in scored[:10]]
+        scores = self._get_digital_scores()
+        top = _top_indices(self._score_array, 10)
+        return [{"name": self.associations[i].get('name', 'Unknown'), "score": scores[i]} for i in top]
     
     def _identify_improvement_opportunities(self):
         return ["Increase tenant portal adoption", "Improve website functionality", "Enhance online service delivery"]
@@ -510,48 +782,31 @@ class OutputGenerator:
     def _recommend_technology_investments(self):
         return ["Tenant portal platforms", "AI-powered analytics", "Mobile applications"]
     
-    def _calculate_avg_confidence(self, ai_enhanced):
-        confidences = []
-        for assoc in ai_enhanced:
-            ai_data = assoc.get('ai_insights', {})
-            if isinstance(ai_data, dict):
-                confidence = ai_data.get('confidence_metrics', {}).get('analysis_confidence', 0)
-                if confidence > 0:
-                    confidences.append(confidence)
-        return sum(confidences) / len(confidences) if confidences else 0
-    
-    def _analyze_ai_digital_maturity(self, ai_enhanced):
-        scores = []
-        for assoc in ai_enhanced:
-            ai_data = assoc.get('ai_insights', {})
-            if isinstance(ai_data, dict):
-                score = ai_data.get('digital_maturity_assessment', {}).get('overall_score', 0)
-                if score > 0:
-                    scores.append(score)
-        
-        if not scores:
+    def _calculate_avg_confidence(self, ai):
+        confidences = ai['analysis_conf']
+        confidences = confidences[confidences > 0]
+        return float(confidences.mean()) if confidences.size else 0
+    
+    def _analyze_ai_digital_maturity(self, ai):
+        scores = ai['overall']
+        scores = scores[scores > 0]
+        
+        if not scores.size:
             return {"average": 0, "distribution": {"leaders": 0, "followers": 0, "laggards": 0}}
         
-        avg_score = sum(scores) / len(scores)
+        # Bin each score against the 5 / 8 band edges in one pass: 0 = laggard, 1 = follower, 2 = leader
+        laggards, followers, leaders = np.bincount(np.searchsorted(MATURITY_BAND_EDGES, scores, side='right'), minlength=3)
         return {
-            "average": avg_score,
+            "average": float(scores.mean()),
             "distribution": {
-                "leaders": len([s for s in scores if s >= 8]),
-                "followers": len([s for s in scores if 5 <= s < 8]),
-                "laggards": len([s for s in scores if s < 5])
+                "leaders": int(leaders),
+                "followers": int(followers),
+                "laggards": int(laggards)
             }
         }
     
-    def _summarize_transformation_opportunities(self, ai_enhanced):
-        all_opportunities = []
-        for assoc in ai_enhanced:
-            ai_data = assoc.get('ai_insights', {})
-            if isinstance(ai_data, dict):
-                opportunities = ai_data.get('ai_transformation_opportunities', [])
-                if isinstance(opportunities, list):
-                    all_opportunities.extend(opportunities)
-        
-        return {"total_opportunities": len(all_opportunities), "top_categories": ["Digital services", "AI integration", "Process automation"]}
+    def _summarize_transformation_opportunities(self, ai):
+        return {"total_opportunities": int(ai['opps_count'].sum()), "top_categories": ["Digital services", "AI integration", "Process automation"]}
     
     def _extract_strategic_insights(self, ai_enhanced):
         return {"key_themes": ["Digital transformation urgency", "Tenant experience focus", "Operational efficiency gains"]}
@@ -4,16 +4,196 @@ Supports multiple LLM providers with fallback options
 """
 
 import asyncio
+import concurrent.futures
+import functools
+import hashlib
+import inspect
 import json
 import os
 import logging
-from typing import Dict, List, Any, Optional
+import random
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Mapping, AsyncIterator
 from datetime import datetime
 import aiohttp
-import requests
 
 logger = logging.getLogger(__name__)
 
+# Transient provider failures are retried with exponential backoff and full
+# jitter before the manager falls back to the next provider
+PROVIDER_MAX_ATTEMPTS = 3
+PROVIDER_RETRY_BASE_DELAY = 0.5
+PROVIDER_RETRY_MAX_DELAY = 8.0
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Generation keyword arguments the manager passes through, and the Vertex
+# generation config field each one sets; response_mime_type="application/json"
+# with a response_schema asks Gemini for schema-conforming JSON output
+VERTEX_GENERATION_PARAMS = {
+    'max_tokens': 'max_output_tokens',
+    'temperature': 'temperature',
+    'response_mime_type': 'response_mime_type',
+    'response_schema': 'response_schema',
+}
+
+# Liveness probes ask for a single token so a health check costs next to nothing
+PING_PROMPT = "Reply with OK."
+PING_TIMEOUT = 2.0
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a provider error is transient (timeout, dropped connection, 429 or 5xx)"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, aiohttp.ClientError)):
+        return True
+    
+    # OpenAI errors carry status_code; Google API errors carry an HTTP code
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS_CODES:
+        return True
+    
+    # openai.APIConnectionError (and its APITimeoutError subclass) have no status
+    return any(cls.__name__ == 'APIConnectionError' for cls in type(error).__mro__)
+
+class TokenBucket:
+    """Client-side rate limiter: `rate` tokens per second refill a bucket of `capacity`.
+    
+    A caller takes its tokens straight away, running the bucket into debt if
+    need be, and then sleeps until the refill has paid that debt back; later
+    callers see the deeper debt and wait their turn, so no lock is needed.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    @classmethod
+    def per_minute(cls, tokens_per_minute: int) -> 'TokenBucket':
+        """Bucket enforcing a tokens-per-minute quota, allowing a minute's worth in a burst"""
+        return cls(tokens_per_minute / 60, tokens_per_minute)
+    
+    async def acquire(self, tokens: int = 1):
+        """Take tokens from the bucket, waiting for the refill if there aren't enough"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        
+        self.tokens -= tokens
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+# A provider that keeps failing is skipped for a cooldown instead of making
+# every request wait out its timeouts; the manager falls through to the next
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_AFTER = 30.0
+
+class CircuitBreaker:
+    """Per-provider circuit breaker: closed, open for a cooldown, then half open.
+    
+    After `fail_threshold` consecutive failures the circuit opens and calls are
+    refused for `reset_after` seconds. It then lets one probe call through;
+    success closes the circuit and failure reopens it.
+    """
+    
+    def __init__(self, fail_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_after: float = CIRCUIT_RESET_AFTER):
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_after:
+            return 'open'
+        return 'half_open'
+    
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'open':
+            return False
+        
+        # Half open: one probe at a time; a probe that never reported back
+        # (cancelled, say) stops blocking others after another cooldown
+        now = time.monotonic()
+        if self.probe_started is None or now - self.probe_started >= self.reset_after:
+            self.probe_started = now
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+    
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started = None
+        if self.opened_at is not None or self.failures >= self.fail_threshold:
+            self.opened_at = time.monotonic()
+
+@functools.lru_cache(maxsize=1)
+def _env_config() -> Mapping[str, Optional[str]]:
+    """Provider settings from the environment, with .env loaded once per process"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    return MappingProxyType({
+        'vertex_project_id': os.getenv('GOOGLE_CLOUD_PROJECT', 'housing-ai-platform-470118'),
+        'vertex_location': os.getenv('VERTEX_AI_LOCATION', 'us-central1'),
+        'vertex_model_name': os.getenv('VERTEX_AI_MODEL', 'gemini-1.5-pro'),
+        'google_credentials_path': os.getenv('GOOGLE_APPLICATION_CREDENTIALS'),
+        'openai_api_key': os.getenv('OPENAI_API_KEY'),
+        'openai_model_name': os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo'),
+        'openai_base_url': os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+        'vertex_tokens_per_minute': os.getenv('VERTEX_AI_TOKENS_PER_MINUTE', '1000000'),
+        'openai_tokens_per_minute': os.getenv('OPENAI_TOKENS_PER_MINUTE', '200000'),
+        'vertex_workers': os.getenv('VERTEX_WORKERS', '64'),
+    })
+
+@functools.lru_cache(maxsize=1)
+def _sync_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Thread pool for blocking SDK calls, shared by every provider.
+    
+    Sized for I/O-bound calls that mostly wait on the network, and kept apart
+    from the event loop's default executor so a burst of model calls cannot
+    starve other to_thread work.
+    """
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=int(_env_config()['vertex_workers']), thread_name_prefix="vertex-llm"
+    )
+
+def install_uvloop() -> bool:
+    """Run new event loops on uvloop when the optional package is installed.
+    
+    Call before asyncio.run(); returns False and leaves the default loop otherwise.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+# Provider instances keyed by class and a hash of their config, so managers with
+# identical settings share one client (and its connection pool)
+_client_cache: Dict[str, 'BaseLLMProvider'] = {}
+_client_cache_lock = threading.Lock()
+
+def clear_client_cache():
+    """Forget all cached provider instances"""
+    with _client_cache_lock:
+        _client_cache.clear()
+
 class LLMConnectionManager:
     """Manages connections to multiple LLM providers"""
     
@@ -21,31 +201,43 @@ class LLMConnectionManager:
         self.providers = {}
         self.active_provider = None
         self.fallback_providers = []
+        self._start_task: Optional[asyncio.Task] = None
+        self._started = False
+        # (provider id, name, instance) in the order generate_content tries them
+        self._provider_chain: List[tuple] = []
         
-        # Initialize all available providers
+        # Initialize all available providers; connections are tested by start()
         self.init_providers()
+    
+    async def start(self):
+        """Test connections and set the active provider, once per manager.
         
-        # Test connections and set active provider
-        asyncio.create_task(self.test_all_connections())
+        Concurrent callers wait on the same probe rather than starting their own.
+        """
+        if self._started:
+            return
+        if self._start_task is None:
+            self._start_task = asyncio.create_task(self.test_all_connections())
+        await self._start_task
+        self._started = True
     
     def init_providers(self):
         """Initialize all LLM provider configurations"""
         
-        # Load environment variables first
-        from dotenv import load_dotenv
-        load_dotenv()
+        env = _env_config()
         
         # Google Vertex AI
         self.providers['vertex_ai'] = {
             'name': 'Google Vertex AI',
             'class': VertexAIProvider,
             'config': {
-                'project_id': os.getenv('GOOGLE_CLOUD_PROJECT', 'housing-ai-platform-470118'),
-                'location': os.getenv('VERTEX_AI_LOCATION', 'us-central1'),
-                'model_name': os.getenv('VERTEX_AI_MODEL', 'gemini-1.5-pro'),
-                'credentials_path': os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+                'project_id': env['vertex_project_id'],
+                'location': env['vertex_location'],
+                'model_name': env['vertex_model_name'],
+                'credentials_path': env['google_credentials_path']
             },
             'priority': 1,
+            'tokens_per_minute': int(env['vertex_tokens_per_minute']),
             'status': 'unknown'
         }
         
@@ -54,11 +246,12 @@ class LLMConnectionManager:
             'name': 'OpenAI GPT',
             'class': OpenAIProvider,
             'config': {
-                'api_key': os.getenv('OPENAI_API_KEY'),
-                'model_name': os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo'),
-                'base_url': os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+                'api_key': env['openai_api_key'],
+                'model_name': env['openai_model_name'],
+                'base_url': env['openai_base_url']
             },
             'priority': 2,
+            'tokens_per_minute': int(env['openai_tokens_per_minute']),
             'status': 'unknown'
         }
         
@@ -70,40 +263,31 @@ class LLMConnectionManager:
             'priority': 999,
             'status': 'unknown'
         }
+        
+        # Requests are paced against each provider's tokens-per-minute quota
+        # before they are sent, rather than discovered through 429s
+        self._rate_limits = {
+            provider_id: TokenBucket.per_minute(provider['tokens_per_minute'])
+            for provider_id, provider in self.providers.items()
+            if provider.get('tokens_per_minute')
+        }
+        self._breakers = {provider_id: CircuitBreaker() for provider_id in self.providers}
     
     async def test_all_connections(self):
         """Test all provider connections and set active provider"""
         
         logger.info("Testing LLM provider connections...")
         
-        working_providers = []
-        
         # Sort providers by priority
         sorted_providers = sorted(self.providers.items(), key=lambda x: x[1]['priority'])
         
-        for provider_id, provider_config in sorted_providers:
-            try:
-                logger.info(f"Testing {provider_config['name']}...")
-                
-                # Create provider instance
-                provider_class = provider_config['class']
-                provider = provider_class(provider_config['config'])
-                
-                # Test connection
-                test_result = await provider.test_connection()
-                
-                if test_result['success']:
-                    provider_config['status'] = 'connected'
-                    provider_config['instance'] = provider
-                    working_providers.append((provider_id, provider_config))
-                    logger.info(f"✅ {provider_config['name']} connected successfully")
-                else:
-                    provider_config['status'] = 'failed'
-                    logger.warning(f"❌ {provider_config['name']} connection failed: {test_result.get('error', 'Unknown error')}")
-                
-            except Exception as e:
-                provider_config['status'] = 'error'
-                logger.error(f"❌ {provider_config['name']} error: {e}")
+        # Probes are independent, so run them concurrently; startup then waits for
+        # the slowest provider rather than the sum of all of them
+        results = await asyncio.gather(*[self._probe(provider_config) for _, provider_config in sorted_providers])
+        
+        # gather preserves input order, so working providers stay in priority order
+        working_providers = [(provider_id, provider_config)
+                             for (provider_id, provider_config), ok in zip(sorted_providers, results) if ok]
         
         # Set active provider (first working one)
         if working_providers:
@@ -119,19 +303,49 @@ class LLMConnectionManager:
             # Create a mock provider for testing
             self.create_mock_provider()
     
+    async def _probe(self, provider_config: Dict[str, Any]) -> bool:
+        """Create and test one provider, recording its status; returns True if it connected"""
+        try:
+            logger.info(f"Testing {provider_config['name']}...")
+            
+            # Create provider instance (shared with any other manager using the same config)
+            provider_class = provider_config['class']
+            provider = provider_class.get_or_create(provider_config['config'])
+            
+            # Test connection
+            test_result = await provider.test_connection()
+            
+            if test_result['success']:
+                provider_config['status'] = 'connected'
+                provider_config['instance'] = provider
+                logger.info(f"✅ {provider_config['name']} connected successfully")
+                return True
+            
+            provider_config['status'] = 'failed'
+            logger.warning(f"❌ {provider_config['name']} connection failed: {test_result.get('error', 'Unknown error')}")
+            
+        except Exception as e:
+            provider_config['status'] = 'error'
+            logger.error(f"❌ {provider_config['name']} error: {e}")
+        
+        return False
+    
     def create_mock_provider(self):
         """Create a mock provider for testing when no real providers are available"""
         
         logger.warning("Creating mock LLM provider for testing...")
         
         self.providers['mock']['status'] = 'connected'
-        self.providers['mock']['instance'] = MockProvider({})
+        self.providers['mock']['instance'] = MockProvider.get_or_create({})
         
         self.active_provider = 'mock'
         self.fallback_providers = []
     
-    async def generate_content(self, prompt: str, **kwargs) -> str:
-        """Generate content using the active provider with fallback"""
+    async def _providers_to_try(self) -> List[tuple]:
+        """(id, name, instance) of the providers to try in order: the active one, then its fallbacks"""
+        
+        # Providers must have been probed before one can be chosen
+        await self.start()
         
         if not self.active_provider:
             # Try to find a connected provider
@@ -143,27 +357,115 @@ class LLMConnectionManager:
             if not self.active_provider:
                 raise Exception("No LLM provider available")
         
-        # Try active provider first
-        providers_to_try = [self.active_provider] + self.fallback_providers
+        # The chain is built once and reused; it is only rebuilt when the active
+        # provider has changed since (including when it is set by hand)
+        if not self._provider_chain or self._provider_chain[0][0] != self.active_provider:
+            self._provider_chain = [
+                (provider_id, self.providers[provider_id]['name'], self.providers[provider_id]['instance'])
+                for provider_id in [self.active_provider] + self.fallback_providers
+                if self.providers.get(provider_id, {}).get('instance')
+            ]
         
-        for provider_id in providers_to_try:
+        return self._provider_chain
+    
+    async def generate_content(self, prompt: str, **kwargs) -> str:
+        """Generate content using the active provider with fallback"""
+        
+        for provider_id, name, provider in await self._providers_to_try():
+            breaker = self._breakers[provider_id]
+            if not breaker.allow():
+                continue
+            
             try:
-                provider_config = self.providers.get(provider_id)
-                if not provider_config or not provider_config.get('instance'):
-                    continue
-                    
-                provider = provider_config['instance']
-                result = await provider.generate_content(prompt, **kwargs)
+                await self._rate_limit(provider_id, prompt)
+                result = await self._call_with_retry(name, lambda: provider.generate_content(prompt, **kwargs))
                 
-                logger.info(f"✅ Content generated using {provider_config['name']}")
+                breaker.record_success()
+                logger.info("✅ Content generated using %s", name)
                 return result
                 
             except Exception as e:
-                logger.warning(f"❌ {self.providers[provider_id]['name']} failed: {e}")
+                breaker.record_failure()
+                logger.warning(f"❌ {name} failed: {e}")
                 continue
         
         raise Exception("All LLM providers failed to generate content")
     
+    async def ping(self, timeout: float = PING_TIMEOUT) -> Dict[str, Any]:
+        """Cheap liveness check: a one-token generation from the first provider that answers.
+        
+        Skips the rate limiter, retries and success logging that generate_content
+        goes through, and gives each provider at most `timeout` seconds.
+        """
+        errors = []
+        for provider_id, name, provider in await self._providers_to_try():
+            try:
+                response = await asyncio.wait_for(
+                    provider.generate_content(PING_PROMPT, max_tokens=1, temperature=0), timeout
+                )
+                return {'success': True, 'response': response, 'provider': provider_id, 'provider_name': name}
+            except Exception as e:
+                errors.append(f"{name}: {e!r}")
+        
+        return {'success': False, 'error': '; '.join(errors) or 'No LLM provider available'}
+    
+    async def _rate_limit(self, provider_id: str, prompt: str):
+        """Wait for the provider's token bucket to cover the prompt (about four characters a token)"""
+        bucket = self._rate_limits.get(provider_id)
+        if bucket is not None:
+            await bucket.acquire(len(prompt) // 4 or 1)
+    
+    async def _call_with_retry(self, provider_name: str, call):
+        """Await call(), retrying transient failures with exponential backoff and jitter"""
+        for attempt in range(1, PROVIDER_MAX_ATTEMPTS + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == PROVIDER_MAX_ATTEMPTS or not _is_retryable(e):
+                    raise
+                
+                # Full jitter keeps concurrent callers from retrying in lockstep
+                delay = random.uniform(0, min(PROVIDER_RETRY_MAX_DELAY, PROVIDER_RETRY_BASE_DELAY * 2 ** attempt))
+                logger.warning(f"{provider_name} transient failure (attempt {attempt}/{PROVIDER_MAX_ATTEMPTS}), "
+                               f"retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+    
+    async def stream_content(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream content from the active provider as it is generated.
+        
+        Falls back to the next provider only if one fails before producing any
+        text; a failure mid-stream is raised, since part of the answer was sent.
+        """
+        
+        for provider_id, name, provider in await self._providers_to_try():
+            breaker = self._breakers[provider_id]
+            if not breaker.allow():
+                continue
+            
+            started = False
+            try:
+                await self._rate_limit(provider_id, prompt)
+                async for chunk in provider.stream_content(prompt, **kwargs):
+                    # The provider has answered once the first chunk arrives;
+                    # consumers often close the stream early, so success can't
+                    # wait until it is drained
+                    if not started:
+                        started = True
+                        breaker.record_success()
+                    yield chunk
+                
+                breaker.record_success()
+                logger.info("✅ Content streamed using %s", name)
+                return
+                
+            except Exception as e:
+                breaker.record_failure()
+                if started:
+                    raise
+                logger.warning(f"❌ {name} failed: {e}")
+        
+        raise Exception("All LLM providers failed to generate content")
+    
     def get_provider_status(self) -> Dict[str, Any]:
         """Get status of all providers"""
         
@@ -175,7 +477,8 @@ class LLMConnectionManager:
                 provider_id: {
                     'name': config['name'],
                     'status': config['status'],
-                    'priority': config['priority']
+                    'priority': config['priority'],
+                    'circuit': self._breakers[provider_id].state
                 }
                 for provider_id, config in self.providers.items()
             }
@@ -189,6 +492,25 @@ class BaseLLMProvider:
         self.config = config
         self.name = "Base Provider"
     
+    @classmethod
+    def get_or_create(cls, config: Dict[str, Any]) -> 'BaseLLMProvider':
+        """Return the cached provider for this config, creating it on first use.
+        
+        Set use_cached_client=False in the config to always get a fresh instance.
+        """
+        if config.get('use_cached_client') is False:
+            return cls(config)
+        
+        config_json = json.dumps(config, sort_keys=True, default=str)
+        key = f"{cls.__name__}:{hashlib.sha256(config_json.encode('utf-8')).hexdigest()}"
+        
+        with _client_cache_lock:
+            provider = _client_cache.get(key)
+            if provider is None:
+                provider = _client_cache[key] = cls(config)
+        
+        return provider
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test the connection to the provider"""
         raise NotImplementedError
@@ -196,11 +518,18 @@ class BaseLLMProvider:
     async def generate_content(self, prompt: str, **kwargs) -> str:
         """Generate content using the provider"""
         raise NotImplementedError
+    
+    async def stream_content(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Yield generated text as it arrives; providers without streaming yield it whole"""
+        yield await self.generate_content(prompt, **kwargs)
 
 # Google Vertex AI Provider
 class VertexAIProvider(BaseLLMProvider):
     """Google Vertex AI provider"""
     
+    # Generation config fields already warned about as unsupported by the SDK
+    _dropped_fields = set()
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.name = "Google Vertex AI"
@@ -210,14 +539,11 @@ class VertexAIProvider(BaseLLMProvider):
             import vertexai
             from vertexai.generative_models import GenerativeModel
             
-            # Load environment variables
-            from dotenv import load_dotenv
-            load_dotenv()
-            
             # Get project ID from config first, then environment
-            project_id = config.get('project_id') or os.getenv('GOOGLE_CLOUD_PROJECT', 'housing-ai-platform-470118')
-            location = config.get('location') or os.getenv('VERTEX_AI_LOCATION', 'us-central1')
-            model_name = config.get('model_name') or os.getenv('VERTEX_AI_MODEL', 'gemini-1.5-pro')
+            env = _env_config()
+            project_id = config.get('project_id') or env['vertex_project_id']
+            location = config.get('location') or env['vertex_location']
+            model_name = config.get('model_name') or env['vertex_model_name']
             
             print(f"Initializing Vertex AI with project: {project_id}, location: {location}, model: {model_name}")
             
@@ -233,11 +559,64 @@ class VertexAIProvider(BaseLLMProvider):
             logger.error(f"Failed to initialize Vertex AI: {e}")
             raise
     
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def _supported_generation_fields() -> frozenset:
+        """Generation config fields the installed SDK accepts.
+        
+        Older SDKs reject response_mime_type and response_schema outright, so
+        those are dropped there rather than failing every call.
+        """
+        from vertexai.generative_models import GenerationConfig
+        return frozenset(inspect.signature(GenerationConfig.__init__).parameters)
+    
+    @classmethod
+    def _generation_config(cls, kwargs: Dict[str, Any]) -> Optional[Any]:
+        """Vertex generation config for the generation keyword arguments given.
+        
+        Built as the SDK's typed GenerationConfig: only that converts a
+        response_schema written as an OpenAPI-style dict ('type': 'object')
+        into the proto schema; a plain dict is handed to the proto as is and
+        rejected.
+        """
+        supported = cls._supported_generation_fields()
+        config = {}
+        for key, value in kwargs.items():
+            field = VERTEX_GENERATION_PARAMS.get(key)
+            if field is None or value is None:
+                continue
+            if field not in supported:
+                if field not in cls._dropped_fields:
+                    cls._dropped_fields.add(field)
+                    logger.warning("Vertex AI SDK does not support generation_config.%s; upgrade "
+                                   "google-cloud-aiplatform for structured output. Dropping it.", field)
+                continue
+            config[field] = value
+        if not config:
+            return None
+        
+        from vertexai.generative_models import GenerationConfig
+        return GenerationConfig(**config)
+    
+    async def _generate(self, prompt: str, **kwargs):
+        """Call the model without blocking the event loop"""
+        generation_config = self._generation_config(kwargs)
+        
+        # The SDK's native coroutine where available; otherwise the blocking call
+        # runs on the dedicated SDK thread pool
+        generate_async = getattr(self.model, 'generate_content_async', None)
+        if generate_async is not None:
+            return await generate_async(prompt, generation_config=generation_config)
+        return await asyncio.get_running_loop().run_in_executor(
+            _sync_executor(),
+            functools.partial(self.model.generate_content, prompt, generation_config=generation_config)
+        )
+    
     async def test_connection(self) -> Dict[str, Any]:
         """Test Vertex AI connection"""
         try:
             # Simple test prompt
-            response = self.model.generate_content("Hello, this is a test. Please respond with 'Connection successful'.")
+            response = await self._generate("Hello, this is a test. Please respond with 'Connection successful'.")
             
             if response and response.text:
                 return {'success': True, 'response': response.text}
@@ -250,12 +629,32 @@ class VertexAIProvider(BaseLLMProvider):
     async def generate_content(self, prompt: str, **kwargs) -> str:
         """Generate content using Vertex AI"""
         try:
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt, **kwargs)
             return response.text if response else "No response generated"
             
         except Exception as e:
             logger.error(f"Vertex AI generation failed: {e}")
             raise
+    
+    async def stream_content(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream content from Vertex AI as the model produces it"""
+        if getattr(self.model, 'generate_content_async', None) is None:
+            async for text in super().stream_content(prompt, **kwargs):
+                yield text
+            return
+        
+        try:
+            responses = await self.model.generate_content_async(
+                prompt, generation_config=self._generation_config(kwargs), stream=True
+            )
+            async for response in responses:
+                # Safety-filtered or empty chunks carry no candidate text
+                if response.candidates and response.candidates[0].content.parts:
+                    yield response.text
+        
+        except Exception as e:
+            logger.error(f"Vertex AI streaming failed: {e}")
+            raise
 
 # OpenAI Provider
 class OpenAIProvider(BaseLLMProvider):
@@ -266,10 +665,18 @@ class OpenAIProvider(BaseLLMProvider):
         self.name = "OpenAI GPT"
         
         try:
+            import httpx
             import openai
+            
+            # Size the keep-alive pool for concurrent discovery calls; the SDK
+            # default lets bursts open throwaway connections
             self.client = openai.AsyncOpenAI(
                 api_key=config.get('api_key'),
-                base_url=config.get('base_url', 'https://api.openai.com/v1')
+                base_url=config.get('base_url', 'https://api.openai.com/v1'),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=30),
+                    timeout=60
+                )
             )
             self.model_name = config.get('model_name', 'gpt-3.5-turbo')
             
@@ -297,6 +704,17 @@ class OpenAIProvider(BaseLLMProvider):
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def _response_format(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON mode for callers asking for an application/json response.
+        
+        Chat completions take no schema in this mode, so response_schema is
+        left to the prompt.
+        """
+        if kwargs.get('response_mime_type') == 'application/json':
+            return {'response_format': {'type': 'json_object'}}
+        return {}
+    
     async def generate_content(self, prompt: str, **kwargs) -> str:
         """Generate content using OpenAI"""
         try:
@@ -304,7 +722,8 @@ class OpenAIProvider(BaseLLMProvider):
                 model=self.model_name,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=kwargs.get('max_tokens', 2000),
-                temperature=kwargs.get('temperature', 0.7)
+                temperature=kwargs.get('temperature', 0.7),
+                **self._response_format(kwargs)
             )
             
             return response.choices[0].message.content if response.choices else "No response generated"
@@ -312,6 +731,29 @@ class OpenAIProvider(BaseLLMProvider):
         except Exception as e:
             logger.error(f"OpenAI generation failed: {e}")
             raise
+    
+    async def stream_content(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream content from OpenAI token by token"""
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=kwargs.get('max_tokens', 2000),
+                temperature=kwargs.get('temperature', 0.7),
+                stream=True,
+                **self._response_format(kwargs)
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            
+        except Exception as e:
+            logger.error(f"OpenAI streaming failed: {e}")
+            raise
+
+# Prompt keywords that select MockProvider's canned responses
+MOCK_PROMPT_KEYWORDS = re.compile(r'create|component|regulatory|document', re.IGNORECASE)
 
 # Mock Provider for Testing
 class MockProvider(BaseLLMProvider):
@@ -328,10 +770,11 @@ class MockProvider(BaseLLMProvider):
     async def generate_content(self, prompt: str, **kwargs) -> str:
         """Generate mock content"""
         
-        # Simple mock responses based on prompt content
-        prompt_lower = prompt.lower()
+        # Simple mock responses based on prompt content; one case-insensitive scan
+        # finds every keyword without copying the prompt to lower case
+        keywords = {keyword.lower() for keyword in MOCK_PROMPT_KEYWORDS.findall(prompt)}
         
-        if 'create' in prompt_lower and 'component' in prompt_lower:
+        if 'create' in keywords and 'component' in keywords:
             return """
             {
                 "message": "I understand you want to create a new component. Here's what I would do:",
@@ -349,7 +792,7 @@ class MockProvider(BaseLLMProvider):
             }
             """
         
-        elif 'regulatory' in prompt_lower or 'document' in prompt_lower:
+        elif 'regulatory' in keywords or 'document' in keywords:
             return """
             I understand you're looking for regulatory documents. In a real implementation, I would:
             
@@ -378,8 +821,14 @@ class MockProvider(BaseLLMProvider):
 llm_manager = None
 
 def get_llm_manager() -> LLMConnectionManager:
-    """Get global LLM connection manager instance"""
+    """Get global LLM connection manager instance (providers are probed on first use)"""
     global llm_manager
     if llm_manager is None:
         llm_manager = LLMConnectionManager()
-    return llm_manager
\ No newline at end of file
+    return llm_manager
+
+async def get_llm_manager_async() -> LLMConnectionManager:
+    """Get global LLM connection manager instance with its provider connections tested"""
+    manager = get_llm_manager()
+    await manager.start()
+    return manager
\ No newline at end of file
@@ -3,99 +3,691 @@ Updated Production Vertex AI Agent with enhanced connection management
 """
 
 import asyncio
+import concurrent.futures
+import copy
+import functools
+import hashlib
+import itertools
+import json
 import logging
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import os
+import re
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Import the new connection manager
 from vertex_agents.llm_connection_manager import get_llm_manager
 
 logger = logging.getLogger(__name__)
 
+# Generation settings for the structured analysis prompts
+ANALYSIS_MAX_TOKENS = 4096
+ANALYSIS_TEMPERATURE = 0.3
+
+# Analysis calls in flight at once per agent, and the hard limit on each one;
+# the timeout stops a hung provider call from stalling a whole run
+ANALYSIS_CONCURRENCY = 16
+ANALYSIS_TIMEOUT = 65
+
+# analyze_many defaults: associations in flight at once, sized to stay inside
+# Gemini 2.5 Pro's per-project queries-per-minute quota, and the limit on each
+# association's whole analysis (cache lookups included)
+ANALYZE_MANY_CONCURRENCY = 16
+ANALYZE_MANY_TIMEOUT = 90
+
+# generate_content_async calls in flight at once per agent; bursts beyond this
+# queue here rather than opening more provider connections and drawing 429s
+GENERATION_CONCURRENCY = 32
+
+# Responses from generate_content_async are reused for identical prompts and
+# arguments for this long (seconds)
+RESPONSE_CACHE_TTL = 600
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+
+# A successful connection test is reused for this many seconds, so frequent
+# health checks do not each call the model
+HEALTH_CHECK_TTL = 15
+
+# Reply returned in place of generated content when every provider fails; %s
+# is the error detail, whose message part is cut to ERROR_DETAIL_LIMIT characters
+GENERATION_ERROR_MESSAGE = ("I apologize, but I'm having trouble connecting to the AI service. "
+                            "Error: %s. Please check your LLM provider configuration.")
+ERROR_DETAIL_LIMIT = 200
+
+# Longest prompt or response kept verbatim in the conversation history
+HISTORY_TEXT_LIMIT = 8192
+
+# The newest turns are kept whole; older ones lose their kwargs and response
+# text, and beyond HISTORY_SUMMARY_TURNS only a hashed summary remains
+HISTORY_FULL_TURNS = 5
+HISTORY_SUMMARY_TURNS = 20
+
+# Streamed text is passed on at most this often (seconds), so token-sized
+# chunks are coalesced rather than each costing a consumer round trip
+STREAM_COALESCE_INTERVAL = 0.03
+
+# Seconds between status checks while a batch prediction job runs
+BATCH_POLL_INTERVAL = 30
+
+# Digital features tracked for market intelligence, the weight each carries
+# in an association's digital score, and the trend each adoption rate reports
+DIGITAL_FEATURES = ('official_website', 'website_has_tenant_portal', 'website_has_online_services',
+                    'social_media', 'ai_enhanced')
+DIGITAL_FEATURE_WEIGHTS = np.array([2, 3, 2, 1, 0], dtype=np.int8)
+DIGITAL_FEATURE_TRENDS = ('website_adoption_rate', 'tenant_portal_adoption_rate', 'online_services_adoption_rate',
+                          'social_media_adoption_rate', 'ai_analysis_coverage')
+
+# Exact-match cache of analysis results keyed by a hash of the canonical inputs
+EXACT_CACHE_MAX_ENTRIES = 4096
+
+# Business insight prompts carry this many sample analyses, each cut down to
+# its headline figures and first few opportunities to keep the prompt small
+INSIGHT_SAMPLES = 3
+INSIGHT_SAMPLE_OPPORTUNITIES = 2
+
+# Semantic cache for comprehensive analyses: near-duplicate records of the same
+# association (same company number, or the same name when there is none, with
+# other details differing) reuse the earlier analysis
+EMBEDDING_MODEL_NAME = "text-embedding-004"
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 10_000
+SEMANTIC_KEY_FIELDS = ('name', 'company_number', 'official_website',
+                       'website_has_tenant_portal', 'website_has_online_services')
+
+# After the embedding model fails to load or answer, embeddings are skipped
+# for this long, doubling on each further failure up to the maximum
+EMBEDDING_RETRY_DELAY = 30.0
+EMBEDDING_RETRY_MAX_DELAY = 600.0
+
+# Text embedding models by name, loaded once and shared by every agent in the
+# process since callers often construct an agent per request
+_embedding_models: Dict[str, Any] = {}
+# Monotonic time before which embeddings are not tried again, and the next backoff
+_embedding_retry = {'at': 0.0, 'delay': EMBEDDING_RETRY_DELAY}
+
+def _load_embedding_model(model_name: str):
+    """Load a text embedding model into the shared cache (a blocking SDK call)"""
+    model = _embedding_models.get(model_name)
+    if model is None:
+        from vertexai.language_models import TextEmbeddingModel
+        model = _embedding_models[model_name] = TextEmbeddingModel.from_pretrained(model_name)
+    return model
+
+def _embedding_failed(error: Exception):
+    """Back off from the embedding model after a failure, so the semantic cache
+    is skipped for a while rather than costing every analysis a failing call"""
+    delay = _embedding_retry['delay']
+    _embedding_retry['at'] = time.monotonic() + delay
+    _embedding_retry['delay'] = min(delay * 2, EMBEDDING_RETRY_MAX_DELAY)
+    logger.warning(f"Semantic analysis cache paused for {delay:.0f}s, embeddings unavailable: {error!r}")
+
+def _embedding_succeeded():
+    _embedding_retry['delay'] = EMBEDDING_RETRY_DELAY
+
+def _dumps(obj: Any, indent: bool = True, sort_keys: bool = False) -> str:
+    """JSON text for a prompt payload or cache key, using orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=str, option=option).decode('utf-8')
+    return json.dumps(obj, indent=2 if indent else None, sort_keys=sort_keys, default=str)
+
+def _now_iso(seconds: Optional[float] = None) -> str:
+    """UTC time (now by default) as an ISO 8601 string to the second, for result metadata"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+
+def _loads(text: str) -> Any:
+    """Parse JSON text; orjson's JSONDecodeError subclasses the stdlib one"""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+# A markdown code fence (```json or ```) wrapped around a model's JSON reply
+MARKDOWN_FENCE_RE = re.compile(r'\A\s*```(?:json)?\s*|\s*```\s*\Z')
+
+class _JSONObjectTracker:
+    """Finds where the first top-level JSON object closes in text fed a chunk at a time"""
+    
+    __slots__ = ('depth', 'in_string', 'escaped')
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, chunk: str) -> int:
+        """Index just past the object's closing brace within chunk, or -1 if still open"""
+        for i, char in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                # Quoted braces only count once the object has opened
+                self.in_string = self.depth > 0
+            elif char == '{':
+                self.depth += 1
+            elif char == '}' and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    return i + 1
+        return -1
+
+# Prompt templates for the structured analyses. The instructions and schema
+# come first and the %s data payloads last, so every call of a kind shares a
+# byte-identical prefix that Gemini's implicit context caching can reuse
+COMPREHENSIVE_ANALYSIS_PROMPT = """\
+You are an expert housing association digital transformation consultant.
+
+Analyse the housing association given at the end.
+
+Return ONLY valid JSON with this exact structure:
+{
+    "digital_maturity_assessment": {
+        "overall_score": 0-10,
+        "website_quality": 0-10,
+        "digital_services": 0-10,
+        "innovation_readiness": 0-10,
+        "key_strengths": ["list of digital strengths"],
+        "key_gaps": ["list of digital gaps"]
+    },
+    "ai_transformation_opportunities": [
+        {
+            "opportunity": "description",
+            "impact": "low|medium|high",
+            "complexity": "low|medium|high",
+            "estimated_roi": "description"
+        }
+    ],
+    "competitive_positioning": {
+        "market_position": "leader|follower|laggard",
+        "differentiators": ["list of differentiators"],
+        "threats": ["list of threats"]
+    },
+    "strategic_recommendations": ["prioritised list of recommendations"],
+    "confidence_metrics": {
+        "analysis_confidence": 0.0-1.0,
+        "recommendation_confidence": 0.0-1.0,
+        "data_completeness": 0.0-1.0
+    }
+}
+
+Base scores on the data provided and be conservative where data is missing.
+
+Housing association:
+%s
+"""
+
+MARKET_INTELLIGENCE_PROMPT = """\
+You are an expert housing sector market analyst specialising in digital transformation.
+
+Analyse the market data for a region's housing associations given at the end.
+
+Return ONLY valid JSON with this exact structure:
+{
+    "market_overview": {
+        "market_maturity": "emerging|developing|mature",
+        "digital_adoption_level": "low|medium|high",
+        "key_characteristics": ["list of defining market characteristics"]
+    },
+    "competitive_landscape": {
+        "market_leaders": ["associations leading on digital services"],
+        "competitive_intensity": "low|medium|high",
+        "differentiation_factors": ["what separates leaders from laggards"]
+    },
+    "growth_opportunities": [
+        {
+            "opportunity": "description",
+            "market_size": "small|medium|large",
+            "time_to_value": "short|medium|long"
+        }
+    ],
+    "market_risks": ["list of market risks"],
+    "strategic_recommendations": ["list of recommendations for technology providers"]
+}
+
+Region: %s
+
+Market data:
+%s
+"""
+
+BUSINESS_INSIGHTS_PROMPT = """\
+You are a senior strategy consultant advising technology providers to the housing sector.
+
+Advise on the analysed housing associations summarised at the end.
+
+Return ONLY valid JSON with this exact structure:
+{
+    "executive_summary": "2-3 sentence summary",
+    "key_findings": ["list of key findings"],
+    "market_opportunities": [
+        {
+            "opportunity": "description",
+            "potential_value": "low|medium|high",
+            "target_segment": "which associations to target"
+        }
+    ],
+    "investment_priorities": ["ordered list of priorities"],
+    "risk_assessment": {
+        "overall_risk": "low|medium|high",
+        "key_risks": ["list of risks"],
+        "mitigations": ["list of mitigations"]
+    },
+    "next_steps": ["list of concrete next steps"]
+}
+
+Summary statistics across the analysed housing associations:
+%s
+
+Sample individual analyses:
+%s
+"""
+
+# Response schemas matching the prompt templates, in the OpenAPI subset Vertex AI
+# accepts; with response_mime_type="application/json" Gemini returns bare JSON
+# that conforms, with no prose or code fence to strip
+def _string_list() -> Dict[str, Any]:
+    """Schema for a list of strings"""
+    return {'type': 'array', 'items': {'type': 'string'}}
+
+def _enum(*values: str) -> Dict[str, Any]:
+    """Schema for a string restricted to the given values"""
+    return {'type': 'string', 'enum': list(values)}
+
+def _object(**properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema for an object requiring every given property"""
+    return {'type': 'object', 'properties': properties, 'required': list(properties)}
+
+LEVELS = ('low', 'medium', 'high')
+
+COMPREHENSIVE_ANALYSIS_SCHEMA = _object(
+    digital_maturity_assessment=_object(
+        overall_score={'type': 'number'},
+        website_quality={'type': 'number'},
+        digital_services={'type': 'number'},
+        innovation_readiness={'type': 'number'},
+        key_strengths=_string_list(),
+        key_gaps=_string_list()
+    ),
+    ai_transformation_opportunities={'type': 'array', 'items': _object(
+        opportunity={'type': 'string'},
+        impact=_enum(*LEVELS),
+        complexity=_enum(*LEVELS),
+        estimated_roi={'type': 'string'}
+    )},
+    competitive_positioning=_object(
+        market_position=_enum('leader', 'follower', 'laggard'),
+        differentiators=_string_list(),
+        threats=_string_list()
+    ),
+    strategic_recommendations=_string_list(),
+    confidence_metrics=_object(
+        analysis_confidence={'type': 'number'},
+        recommendation_confidence={'type': 'number'},
+        data_completeness={'type': 'number'}
+    )
+)
+
+MARKET_INTELLIGENCE_SCHEMA = _object(
+    market_overview=_object(
+        market_maturity=_enum('emerging', 'developing', 'mature'),
+        digital_adoption_level=_enum(*LEVELS),
+        key_characteristics=_string_list()
+    ),
+    competitive_landscape=_object(
+        market_leaders=_string_list(),
+        competitive_intensity=_enum(*LEVELS),
+        differentiation_factors=_string_list()
+    ),
+    growth_opportunities={'type': 'array', 'items': _object(
+        opportunity={'type': 'string'},
+        market_size=_enum('small', 'medium', 'large'),
+        time_to_value=_enum('short', 'medium', 'long')
+    )},
+    market_risks=_string_list(),
+    strategic_recommendations=_string_list()
+)
+
+BUSINESS_INSIGHTS_SCHEMA = _object(
+    executive_summary={'type': 'string'},
+    key_findings=_string_list(),
+    market_opportunities={'type': 'array', 'items': _object(
+        opportunity={'type': 'string'},
+        potential_value=_enum(*LEVELS),
+        target_segment={'type': 'string'}
+    )},
+    investment_priorities=_string_list(),
+    risk_assessment=_object(
+        overall_risk=_enum(*LEVELS),
+        key_risks=_string_list(),
+        mitigations=_string_list()
+    ),
+    next_steps=_string_list()
+)
+
+class _LeaderCancelled(Exception):
+    """Set on a shared response future when the caller making the call was cancelled"""
+
 class ProductionVertexAIAgent:
     """Production-ready Vertex AI agent with multiple LLM provider support"""
     
+    # One long-lived loop in a daemon thread serves every synchronous
+    # generate_content call, rather than asyncio.run building a loop per call
+    _sync_loop: Optional[asyncio.AbstractEventLoop] = None
+    _sync_loop_lock = threading.Lock()
+    
     def __init__(self):
         self.llm_manager = get_llm_manager()
-        self.conversation_history = []
+        # Bounded so a long-lived agent doesn't pin every prompt it has sent
+        self._history_max = int(os.getenv('VERTEX_HISTORY_MAX', '500'))
+        # The most recent turns as dicts; older ones are archived below
+        self.conversation_history = deque(maxlen=self._history_max)
+        # Archived turns as one column per field rather than a dict each
+        self._history_archive = self._new_history_archive()
+        self._analysis_semaphore = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
+        self._generation_semaphore = asyncio.Semaphore(GENERATION_CONCURRENCY)
+        
+        # Input hash -> result, least recently used first
+        self._exact_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # (unit embedding, association identity, analysis), least recently used first
+        self._semantic_cache: List[Tuple[np.ndarray, Tuple[str, str], Dict[str, Any]]] = []
+        self._semantic_matrix: Optional[np.ndarray] = None
+        
+        # Prompt hash -> (expiry time, response), least recently used first
+        self._response_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        # Prompt hash -> response future of the call currently generating it
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        # (expiry time, result) of the last successful connection test
+        self._last_health: Optional[Tuple[float, Dict[str, Any]]] = None
         
         logger.info("Production Vertex AI Agent initialized with enhanced connection management")
     
     async def generate_content_async(self, prompt: str, **kwargs) -> str:
-        """Generate content using the best available LLM provider"""
+        """Generate content using the best available LLM provider.
+        
+        A prompt answered within the last RESPONSE_CACHE_TTL seconds with the
+        same arguments gets the earlier response; pass cache=False to bypass.
+        """
+        
+        cache_key = self._response_key(prompt, kwargs) if kwargs.pop('cache', True) else None
         
+        # Add to conversation history
+        entry = self._start_history_entry(prompt, kwargs)
         try:
-            # Add to conversation history
-            self.conversation_history.append({
-                'timestamp': datetime.now().isoformat(),
-                'prompt': prompt,
-                'kwargs': kwargs
-            })
-            
-            # Generate content using connection manager
-            response = await self.llm_manager.generate_content(prompt, **kwargs)
-            
-            # Add response to history
-            self.conversation_history[-1]['response'] = response
-            self.conversation_history[-1]['provider'] = self.llm_manager.active_provider
+            if cache_key is not None:
+                cached = self._response_cache_get(cache_key)
+                if cached is not None:
+                    self._set_history_text(entry, 'response', cached)
+                    entry['cached'] = True
+                    return cached
             
-            logger.info(f"Content generated successfully using {self.llm_manager.providers[self.llm_manager.active_provider]['name']}")
+            try:
+                # Generate content using connection manager
+                response = await self._generate_shared(prompt, kwargs, cache_key)
+                
+                # Add response to history
+                self._set_history_text(entry, 'response', response)
+                entry['provider'] = self.llm_manager.active_provider
+                if cache_key is not None:
+                    self._response_cache_put(cache_key, response)
+                
+                # The provider lookup is only worth doing when the line will be emitted
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Content generated successfully using %s", self.provider_name)
+                
+                return response
+                
+            except Exception as e:
+                logger.error("Content generation failed: %r", e)
+                
+                # Add error to history
+                error = entry['error'] = self._error_detail(e)
+                
+                # Return a helpful error message
+                return GENERATION_ERROR_MESSAGE % error
+        
+        finally:
+            self._finish_history_entry(entry)
+    
+    async def stream_content_async(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Stream content from the best available LLM provider as it is generated.
+        
+        Whatever was received is kept in the conversation history even if the
+        consumer stops early or the stream fails part way.
+        """
+        
+        entry = self._start_history_entry(prompt, kwargs)
+        
+        chunks = []
+        pending = []
+        last_yield = time.monotonic()
+        try:
+            async for chunk in self.llm_manager.stream_content(prompt, **kwargs):
+                chunks.append(chunk)
+                pending.append(chunk)
+                now = time.monotonic()
+                if now - last_yield >= STREAM_COALESCE_INTERVAL:
+                    yield ''.join(pending)
+                    pending.clear()
+                    last_yield = now
             
-            return response
+            if pending:
+                yield ''.join(pending)
+            entry['provider'] = self.llm_manager.active_provider
             
         except Exception as e:
-            logger.error(f"Content generation failed: {e}")
-            
-            # Add error to history
-            if self.conversation_history:
-                self.conversation_history[-1]['error'] = str(e)
-            
-            # Return a helpful error message
-            return f"I apologize, but I'm having trouble connecting to the AI service. Error: {str(e)}. Please check your LLM provider configuration."
+            logger.error("Content streaming failed: %r", e)
+            error = entry['error'] = self._error_detail(e)
+            if chunks:
+                raise
+            yield GENERATION_ERROR_MESSAGE % error
+        
+        finally:
+            self._set_history_text(entry, 'response', ''.join(chunks))
+            self._finish_history_entry(entry)
+    
+    @classmethod
+    def _background_loop(cls) -> asyncio.AbstractEventLoop:
+        """The event loop that runs synchronous callers' requests, started on first use"""
+        with cls._sync_loop_lock:
+            if cls._sync_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='vertex-agent-sync-loop', daemon=True).start()
+                cls._sync_loop = loop
+        return cls._sync_loop
     
-    def generate_content(self, prompt: str, **kwargs) -> str:
-        """Synchronous wrapper for generate_content_async"""
+    def generate_content(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """Synchronous wrapper for generate_content_async.
+        
+        Must not be called from a coroutine: blocking there would stall the
+        very loop the request needs, so await generate_content_async instead.
+        """
         
         try:
-            # Try to get existing event loop
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is running, create a task
-                task = asyncio.create_task(self.generate_content_async(prompt, **kwargs))
-                return asyncio.run_coroutine_threadsafe(task, loop).result(timeout=30)
-            else:
-                # If no loop is running, run directly
-                return asyncio.run(self.generate_content_async(prompt, **kwargs))
-        except Exception as e:
-            # Fallback for synchronous execution
-            logger.warning(f"Async execution failed, trying sync fallback: {e}")
-            return asyncio.run(self.generate_content_async(prompt, **kwargs))
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("generate_content would block the running event loop; await generate_content_async instead")
+        
+        future = asyncio.run_coroutine_threadsafe(self.generate_content_async(prompt, **kwargs), self._background_loop())
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    async def warmup(self):
+        """Open provider connections and load models ahead of the first analysis.
+        
+        The provider probes make one small call each, so the Vertex AI model's
+        gRPC channel (or the OpenAI connection pool) is already established
+        when real work arrives. Both the manager and the embedding model are
+        shared process-wide, so warming one agent warms them all.
+        """
+        await self.llm_manager.start()
+        
+        if EMBEDDING_MODEL_NAME not in _embedding_models and time.monotonic() >= _embedding_retry['at']:
+            try:
+                await asyncio.to_thread(_load_embedding_model, EMBEDDING_MODEL_NAME)
+            except Exception as e:
+                _embedding_failed(e)
     
     def get_provider_status(self) -> Dict[str, Any]:
         """Get status of all LLM providers"""
         return self.llm_manager.get_provider_status()
     
+    @property
+    def provider_name(self) -> str:
+        """Display name of the active provider, or 'unknown' while none is set"""
+        return self.llm_manager.providers.get(self.llm_manager.active_provider, {}).get('name', 'unknown')
+    
     def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get conversation history"""
-        return self.conversation_history
+        """Get conversation history, with each entry's ISO 8601 timestamp"""
+        # Entries store time.time_ns(); it is only formatted when read back
+        archive = self._history_archive
+        archived = [
+            {
+                'timestamp': _now_iso(timestamp_ns / 1e9),
+                'timestamp_ns': timestamp_ns,
+                'provider': provider,
+                'prompt_hash': f"{prompt_hash:016x}",
+                'tokens_est': tokens_est,
+                '_archived': True,
+                **({'error': True} if error else {})
+            }
+            for timestamp_ns, provider, prompt_hash, tokens_est, error in zip(
+                archive.timestamp_ns, archive.provider, archive.prompt_hash, archive.tokens_est, archive.error
+            )
+        ]
+        return archived + [
+            {'timestamp': _now_iso(entry['timestamp_ns'] / 1e9), **entry}
+            for entry in self.conversation_history
+        ]
     
     def clear_conversation_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self._history_archive = self._new_history_archive()
+    
+    def history_error_rate(self, turns: int = 100) -> float:
+        """Share of the last `turns` finished generations that failed.
+        
+        Turns still in flight have no outcome yet and are not counted; archived
+        turns are always finished ones.
+        """
+        recent = [entry for entry in self.conversation_history if '_pending' not in entry][-turns:]
+        errors = sum('error' in entry for entry in recent)
+        
+        archived = self._history_archive.error[-(turns - len(recent)):] if turns > len(recent) else b''
+        total = len(recent) + len(archived)
+        if not total:
+            return 0.0
+        return (errors + int(np.frombuffer(archived, dtype=np.uint8).sum())) / total
+    
+    @staticmethod
+    def _new_history_archive() -> SimpleNamespace:
+        """Empty columns for archived turns: nanosecond timestamp, provider id,
+        64-bit prompt hash, token estimate and a failed flag"""
+        return SimpleNamespace(
+            timestamp_ns=array('q'), provider=[], prompt_hash=array('Q'), tokens_est=array('I'), error=bytearray()
+        )
+    
+    def _start_history_entry(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a pending history entry for a turn that is starting"""
+        entry = {'timestamp_ns': time.time_ns(), 'kwargs': kwargs, '_pending': True}
+        self._set_history_text(entry, 'prompt', prompt)
+        self.conversation_history.append(entry)
+        return entry
+    
+    def _finish_history_entry(self, entry: Dict[str, Any]):
+        """Mark a turn finished, once its response or error is recorded, and compact"""
+        entry.pop('_pending', None)
+        self._compact_history()
+    
+    def _compact_history(self):
+        """Shrink finished history entries as newer turns push them past the compaction limits.
+        
+        Called as each turn finishes. Past HISTORY_FULL_TURNS an entry's kwargs go
+        and its response becomes a length marker; past HISTORY_SUMMARY_TURNS it
+        moves to the archive columns as a prompt hash and token estimate. Turns
+        still in flight are left alone until they finish, so a response or error
+        recorded late is never lost.
+        """
+        history = self.conversation_history
+        
+        # kwargs is only dropped here, so its presence marks entries not yet shrunk
+        for entry in itertools.islice(history, max(0, len(history) - HISTORY_FULL_TURNS)):
+            if '_pending' not in entry and 'kwargs' in entry:
+                del entry['kwargs']
+                response = entry.get('response')
+                if isinstance(response, str):
+                    entry['response'] = f"[response {len(response)} chars]"
+        
+        archive = self._history_archive
+        while len(history) > HISTORY_SUMMARY_TURNS and '_pending' not in history[0]:
+            entry = history.popleft()
+            prompt = entry.get('prompt', '')
+            archive.timestamp_ns.append(entry['timestamp_ns'])
+            archive.provider.append(entry.get('provider'))
+            archive.prompt_hash.append(
+                int.from_bytes(hashlib.blake2b(prompt.encode(), digest_size=8).digest(), 'big')
+            )
+            archive.tokens_est.append(len(prompt) // 4)
+            archive.error.append('error' in entry)
+        
+        # Archived and recent turns together stay within VERTEX_HISTORY_MAX
+        excess = len(archive.error) + len(history) - self._history_max
+        if excess > 0:
+            for column in vars(archive).values():
+                del column[:excess]
+    
+    @staticmethod
+    def _error_detail(error: Exception) -> str:
+        """Exception type and message, cut short so a huge error can't bloat the history"""
+        return f"{type(error).__name__}: {str(error)[:ERROR_DETAIL_LIMIT]}"
+    
+    @staticmethod
+    def _set_history_text(entry: Dict[str, Any], field: str, text: str):
+        """Store a prompt or response on a history entry, cut to HISTORY_TEXT_LIMIT characters"""
+        if len(text) > HISTORY_TEXT_LIMIT:
+            text = text[:HISTORY_TEXT_LIMIT]
+            entry['truncated'] = True
+        entry[field] = text
     
     async def test_connection(self) -> Dict[str, Any]:
-        """Test the current LLM connection"""
+        """Test the current LLM connection with a one-token ping.
+        
+        Not recorded in the conversation history; a success is reused for
+        HEALTH_CHECK_TTL seconds.
+        """
+        
+        if self._last_health is not None and time.monotonic() < self._last_health[0]:
+            return self._last_health[1]
         
         try:
-            test_prompt = "Hello! Please respond with 'Connection test successful' to confirm the LLM is working."
-            response = await self.generate_content_async(test_prompt)
-            
-            return {
-                'success': True,
-                'response': response,
-                'provider': self.llm_manager.active_provider,
-                'provider_name': self.llm_manager.providers[self.llm_manager.active_provider]['name'] if self.llm_manager.active_provider else 'None'
-            }
+            result = await self.llm_manager.ping()
+            if result['success']:
+                self._last_health = (time.monotonic() + HEALTH_CHECK_TTL, result)
+            return result
             
         except Exception as e:
             return {
@@ -104,12 +696,550 @@ class ProductionVertexAIAgent:
                 'provider': self.llm_manager.active_provider
             }
 
-# Global instance for backward compatibility
-vertex_ai_agent = None
+    async def analyze_housing_association_comprehensive(self, association_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Comprehensive AI analysis of a single housing association"""
+        
+        cache_key = self._exact_key('comprehensive', association_data)
+        cached = self._exact_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        embedding = await self._embed_association(association_data)
+        if embedding is not None:
+            cached = self._semantic_lookup(embedding, association_data)
+            if cached is not None:
+                return cached
+        
+        prompt = self._comprehensive_prompt(association_data)
+        
+        try:
+            response_text = await self._generate_analysis(prompt, COMPREHENSIVE_ANALYSIS_SCHEMA)
+        except Exception as e:
+            logger.error(f"AI analysis failed for {association_data.get('name', 'Unknown')}: {e!r}")
+            return self._fallback_analysis(association_data, str(e) or type(e).__name__, self._error_type(e))
+        
+        analysis = self._build_analysis(response_text, association_data)
+        if 'error_type' not in analysis:
+            self._exact_put(cache_key, analysis)
+            if embedding is not None:
+                self._semantic_store(embedding, association_data, analysis)
+        return analysis
+    
+    async def analyze_housing_association_batch(self, associations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Analyse many housing associations in one Vertex AI batch prediction job.
+        
+        Batch jobs read their input from Cloud Storage, so this needs the
+        VERTEX_BATCH_GCS_BUCKET environment variable and a Vertex SDK with batch
+        prediction support; without them each association is analysed interactively.
+        """
+        if not associations:
+            return []
+        
+        bucket_name = os.getenv('VERTEX_BATCH_GCS_BUCKET')
+        if bucket_name:
+            try:
+                # The SDK calls block, so the job is submitted and polled off the event loop
+                return await asyncio.to_thread(self._run_batch_prediction, bucket_name, associations)
+            except ImportError as e:
+                logger.warning(f"Vertex AI batch prediction unavailable, analysing interactively: {e}")
+            except Exception as e:
+                logger.error(f"Batch prediction failed, analysing interactively: {e}")
+        
+        return await self.analyze_many(associations)
+    
+    async def analyze_many(self, associations: List[Dict[str, Any]],
+                           max_concurrency: int = ANALYZE_MANY_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Analyse many associations concurrently, in input order.
+        
+        A slow or failing association gets a fallback analysis rather than
+        holding up or aborting the rest.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze_one(association: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        self.analyze_housing_association_comprehensive(association),
+                        timeout=ANALYZE_MANY_TIMEOUT
+                    )
+                except Exception as e:
+                    logger.error(f"AI analysis failed for {association.get('name', 'Unknown')}: {e!r}")
+                    return self._fallback_analysis(association, str(e) or type(e).__name__, self._error_type(e))
+        
+        return await asyncio.gather(*(analyze_one(association) for association in associations))
+    
+    def _run_batch_prediction(self, bucket_name: str, associations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Submit the prompts as a batch prediction job, wait for it and parse each result"""
+        import vertexai
+        from google.cloud import storage
+        from vertexai.batch_prediction import BatchPredictionJob
+        
+        config = self.llm_manager.providers['vertex_ai']['config']
+        prompts = [self._comprehensive_prompt(association) for association in associations]
+        
+        # Write one request per line to Cloud Storage
+        run_id = uuid.uuid4().hex
+        client = storage.Client(project=config['project_id'])
+        bucket = client.bucket(bucket_name)
+        requests_jsonl = "\n".join(
+            json.dumps({
+                "request": {
+                    "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                    "generation_config": {
+                        "temperature": ANALYSIS_TEMPERATURE,
+                        "max_output_tokens": ANALYSIS_MAX_TOKENS,
+                        "response_mime_type": "application/json"
+                    }
+                }
+            })
+            for prompt in prompts
+        )
+        bucket.blob(f"batch_in/{run_id}.jsonl").upload_from_string(requests_jsonl, content_type="application/jsonl")
+        
+        vertexai.init(project=config['project_id'], location=config['location'])
+        job = BatchPredictionJob.submit(
+            source_model=config['model_name'],
+            input_dataset=f"gs://{bucket_name}/batch_in/{run_id}.jsonl",
+            output_uri_prefix=f"gs://{bucket_name}/batch_out/{run_id}"
+        )
+        logger.info(f"Submitted batch prediction job {job.resource_name} for {len(prompts)} associations")
+        
+        while not job.has_ended:
+            time.sleep(BATCH_POLL_INTERVAL)
+            job.refresh()
+        
+        if not job.has_succeeded:
+            raise RuntimeError(f"Batch prediction job {job.resource_name} failed: {job.error}")
+        
+        # Output lines echo their request but aren't ordered, so match results by prompt
+        response_texts = {}
+        output_bucket, _, output_prefix = job.output_location.removeprefix("gs://").partition("/")
+        for blob in client.list_blobs(output_bucket, prefix=output_prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                record = _loads(line)
+                prompt = record['request']['contents'][0]['parts'][0]['text']
+                candidates = record.get('response', {}).get('candidates') or []
+                parts = candidates[0].get('content', {}).get('parts') if candidates else None
+                response_texts[prompt] = parts[0].get('text') if parts else None
+        
+        # One timestamp for the whole job; the batch finishes as a unit
+        analyzed_at = _now_iso()
+        return [self._build_analysis(response_texts.get(prompt), association, analyzed_at)
+                for prompt, association in zip(prompts, associations)]
+    
+    async def advanced_market_intelligence(self, region: str, associations_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """AI market intelligence for a region's housing associations"""
+        
+        cache_key = self._exact_key('market', [region, associations_data])
+        cached = self._exact_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        features = self._digital_features(associations_data)
+        digital_distribution = self._calculate_digital_distribution(features)
+        market_trends = self._identify_market_trends(features)
+        
+        market_summary = {
+            'region': region,
+            'total_associations': len(associations_data),
+            'digital_distribution': digital_distribution,
+            'market_trends': market_trends,
+            'sample_associations': [
+                {
+                    'name': a.get('name') or a.get('company_name', 'Unknown'),
+                    'official_website': a.get('official_website'),
+                    'digital_maturity': a.get('ai_insights', {}).get('digital_maturity_assessment', {}).get('overall_score')
+                }
+                for a in associations_data[:10]
+            ]
+        }
+        
+        prompt = MARKET_INTELLIGENCE_PROMPT % (region, _dumps(market_summary))
+        
+        market_data = {'digital_distribution': digital_distribution, 'market_trends': market_trends}
+        
+        try:
+            response_text = await self._generate_analysis(prompt, MARKET_INTELLIGENCE_SCHEMA)
+            intelligence = self._parse_json_response(response_text)
+        except Exception as e:
+            logger.error(f"Market intelligence generation failed for {region}: {e!r}")
+            return {
+                'region': region,
+                'market_data': market_data,
+                'error': str(e) or type(e).__name__,
+                'error_type': self._error_type(e),
+                'analysis_metadata': {'generated_at': _now_iso(), 'associations_analyzed': len(associations_data)}
+            }
+        
+        intelligence['region'] = region
+        intelligence['market_data'] = market_data
+        intelligence['analysis_metadata'] = {
+            'generated_at': _now_iso(),
+            'associations_analyzed': len(associations_data),
+            'provider': self.llm_manager.active_provider
+        }
+        self._exact_put(cache_key, intelligence)
+        return intelligence
+    
+    async def generate_business_insights(self, analysis_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Business insights across a set of association analyses"""
+        
+        cache_key = self._exact_key('insights', analysis_results)
+        cached = self._exact_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # One pass over the results for all the counts
+        successful = high_confidence = 0
+        maturity_sum = 0
+        for r in analysis_results:
+            confidence = r.get('confidence_metrics', {}).get('analysis_confidence', 0)
+            successful += confidence > 0.5
+            high_confidence += confidence > 0.8
+            maturity_sum += r.get('digital_maturity_assessment', {}).get('overall_score', 0)
+        
+        total = len(analysis_results)
+        summary_stats = {
+            'total_analyses': total,
+            'successful_analyses': successful,
+            'high_confidence_analyses': high_confidence,
+            'average_digital_maturity': maturity_sum / total if total else 0
+        }
+        
+        prompt = BUSINESS_INSIGHTS_PROMPT % (
+            _dumps(summary_stats),
+            _dumps([self._insight_sample(r) for r in analysis_results[:INSIGHT_SAMPLES]])
+        )
+        
+        try:
+            response_text = await self._generate_analysis(prompt, BUSINESS_INSIGHTS_SCHEMA)
+            insights = self._parse_json_response(response_text)
+        except Exception as e:
+            logger.error(f"Business insights generation failed: {e!r}")
+            return {
+                'summary_statistics': summary_stats,
+                'error': str(e) or type(e).__name__,
+                'error_type': self._error_type(e),
+                'analysis_metadata': {'generated_at': _now_iso()}
+            }
+        
+        insights['summary_statistics'] = summary_stats
+        insights['analysis_metadata'] = {
+            'generated_at': _now_iso(),
+            'provider': self.llm_manager.active_provider
+        }
+        self._exact_put(cache_key, insights)
+        return insights
+    
+    async def _generate_analysis(self, prompt: str, schema: Dict[str, Any]) -> str:
+        """Generate a JSON analysis reply within the agent's concurrency limit and timeout"""
+        async with self._analysis_semaphore:
+            return await asyncio.wait_for(self._stream_analysis(prompt, schema), timeout=ANALYSIS_TIMEOUT)
+    
+    async def _stream_analysis(self, prompt: str, schema: Dict[str, Any]) -> str:
+        """Stream a reply, stopping as soon as its JSON object is complete.
+        
+        Anything the model adds after the closing brace (a code fence, a closing
+        remark) is never waited for; replies with no complete object are
+        returned whole for the usual parsing and fallback. The schema is enforced
+        by providers with structured output; the prompt spells it out for the rest.
+        """
+        stream = self.llm_manager.stream_content(
+            prompt, max_tokens=ANALYSIS_MAX_TOKENS, temperature=ANALYSIS_TEMPERATURE,
+            response_mime_type='application/json', response_schema=schema
+        )
+        tracker = _JSONObjectTracker()
+        chunks = []
+        try:
+            async for chunk in stream:
+                end = tracker.feed(chunk)
+                if end >= 0:
+                    chunks.append(chunk[:end])
+                    break
+                chunks.append(chunk)
+        finally:
+            await stream.aclose()
+        return ''.join(chunks)
+    
+    async def _generate_shared(self, prompt: str, kwargs: Dict[str, Any], key: Optional[bytes]) -> str:
+        """Generate a response, with concurrent identical requests sharing one manager call.
+        
+        The first request for a key makes the call; any that arrive while it is
+        in flight await its result (or its exception) instead of calling again.
+        If the caller making the call is cancelled, a waiting request takes over
+        and calls again, so the others are not cancelled along with it.
+        """
+        if key is not None:
+            while key in self._inflight:
+                inflight = self._inflight[key]
+                try:
+                    # Shielded so one waiter giving up doesn't cancel the shared call
+                    return await asyncio.shield(inflight)
+                except _LeaderCancelled:
+                    continue
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        
+        try:
+            async with self._generation_semaphore:
+                response = await self.llm_manager.generate_content(prompt, **kwargs)
+        except asyncio.CancelledError:
+            if key is not None:
+                # The shared future is never cancelled: the waiters weren't
+                future.set_exception(_LeaderCancelled())
+                future.exception()
+            raise
+        except Exception as e:
+            if key is not None:
+                future.set_exception(e)
+                # Mark it retrieved; with no other waiters asyncio would log it as unhandled
+                future.exception()
+            raise
+        else:
+            if key is not None:
+                future.set_result(response)
+            return response
+        finally:
+            if key is not None:
+                del self._inflight[key]
+    
+    @staticmethod
+    def _response_key(prompt: str, kwargs: Dict[str, Any]) -> bytes:
+        """Cache key for a prompt and its generation arguments"""
+        return hashlib.blake2b(prompt.encode(), digest_size=16).digest() + repr(sorted(kwargs.items())).encode()
+    
+    def _response_cache_get(self, key: bytes) -> Optional[str]:
+        """Unexpired cached response for a key, marking it most recently used"""
+        cached = self._response_cache.get(key)
+        if cached is None:
+            return None
+        expires_at, response = cached
+        if expires_at < time.monotonic():
+            del self._response_cache[key]
+            return None
+        self._response_cache.move_to_end(key)
+        return response
+    
+    def _response_cache_put(self, key: bytes, response: str):
+        """Cache a response for RESPONSE_CACHE_TTL seconds, evicting the least recently used when full"""
+        self._response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, response)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            self._response_cache.popitem(last=False)
+    
+    @staticmethod
+    def _exact_key(kind: str, payload: Any) -> str:
+        """Hash of an analysis kind and its inputs in canonical JSON form"""
+        canonical = _dumps(payload, indent=False, sort_keys=True)
+        return kind + ':' + hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+    
+    def _exact_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Copy of the cached result for an input hash, marking it most recently used.
+        
+        Like the semantic cache, entries are copied in and out so a caller
+        changing its result can't change what other callers get.
+        """
+        result = self._exact_cache.get(key)
+        if result is None:
+            return None
+        self._exact_cache.move_to_end(key)
+        return copy.deepcopy(result)
+    
+    def _exact_put(self, key: str, result: Dict[str, Any]):
+        """Remember a copy of a successful result, evicting the least recently used entry when full"""
+        self._exact_cache[key] = copy.deepcopy(result)
+        self._exact_cache.move_to_end(key)
+        if len(self._exact_cache) > EXACT_CACHE_MAX_ENTRIES:
+            self._exact_cache.popitem(last=False)
+    
+    async def _embed_association(self, association_data: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Unit-length embedding of an association's identifying fields, or None when embeddings are unavailable"""
+        if time.monotonic() < _embedding_retry['at']:
+            return None
+        
+        key_text = '|'.join(str(association_data.get(field, '')) for field in SEMANTIC_KEY_FIELDS)
+        try:
+            model = _embedding_models.get(EMBEDDING_MODEL_NAME)
+            if model is None:
+                model = await asyncio.to_thread(_load_embedding_model, EMBEDDING_MODEL_NAME)
+            embeddings = await asyncio.to_thread(model.get_embeddings, [key_text])
+        except Exception as e:
+            _embedding_failed(e)
+            return None
+        _embedding_succeeded()
+        
+        vector = np.asarray(embeddings[0].values, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    @staticmethod
+    def _association_identity(association_data: Dict[str, Any]) -> Tuple[str, str]:
+        """What must match exactly for two records to be the same association:
+        the company number when there is one, otherwise the normalised name"""
+        company_number = str(association_data.get('company_number') or '').strip().upper()
+        if company_number:
+            return ('company_number', company_number)
+        name = association_data.get('name') or association_data.get('company_name') or ''
+        return ('name', ' '.join(str(name).casefold().split()))
+    
+    def _semantic_lookup(self, embedding: np.ndarray, association_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Copy of a cached analysis of the same association whose embedding is
+        within the similarity threshold, restamped for this caller, if any"""
+        if not self._semantic_cache:
+            return None
+        if self._semantic_matrix is None:
+            self._semantic_matrix = np.vstack([vector for vector, _, _ in self._semantic_cache])
+        
+        # Cached vectors are unit length, so the dot product is the cosine similarity
+        similarities = self._semantic_matrix @ embedding
+        candidates = np.flatnonzero(similarities >= SEMANTIC_CACHE_THRESHOLD)
+        if not len(candidates):
+            return None
+        
+        # Similar key text alone is not enough: short keys of different
+        # associations can embed close together
+        identity = self._association_identity(association_data)
+        for index in candidates[np.argsort(similarities[candidates])[::-1]]:
+            if self._semantic_cache[index][1] == identity:
+                break
+        else:
+            return None
+        
+        entry = self._semantic_cache.pop(int(index))
+        self._semantic_cache.append(entry)
+        self._semantic_matrix = None
+        
+        analysis = copy.deepcopy(entry[2])
+        metadata = analysis.setdefault('analysis_metadata', {})
+        metadata['cached_analysis_at'] = metadata.get('analyzed_at')
+        metadata['analyzed_at'] = _now_iso()
+        metadata['association_name'] = association_data.get('name') or association_data.get('company_name', 'Unknown')
+        metadata['cache'] = 'semantic'
+        return analysis
+    
+    def _semantic_store(self, embedding: np.ndarray, association_data: Dict[str, Any], analysis: Dict[str, Any]):
+        """Remember an analysis, evicting the least recently used entry when full"""
+        if len(self._semantic_cache) >= SEMANTIC_CACHE_MAX_ENTRIES:
+            self._semantic_cache.pop(0)
+        self._semantic_cache.append((embedding, self._association_identity(association_data), copy.deepcopy(analysis)))
+        self._semantic_matrix = None
+    
+    @staticmethod
+    def _error_type(error: Exception) -> str:
+        """Classify an analysis failure for the fallback result"""
+        if isinstance(error, asyncio.TimeoutError):
+            return 'timeout'
+        if isinstance(error, json.JSONDecodeError):
+            return 'parse_error'
+        return 'generation_error'
+    
+    def _comprehensive_prompt(self, association_data: Dict[str, Any]) -> str:
+        """Prompt for the comprehensive analysis of one association"""
+        return COMPREHENSIVE_ANALYSIS_PROMPT % _dumps(association_data)
+    
+    def _build_analysis(self, response_text: Optional[str], association_data: Dict[str, Any],
+                        analyzed_at: Optional[str] = None) -> Dict[str, Any]:
+        """Parse a comprehensive analysis response, falling back when it isn't usable JSON"""
+        if not response_text:
+            return self._fallback_analysis(association_data, 'No response received', 'empty_response',
+                                           analyzed_at=analyzed_at)
+        
+        try:
+            analysis = self._parse_json_response(response_text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not parse AI analysis for {association_data.get('name', 'Unknown')}: {e}")
+            return self._fallback_analysis(association_data, str(e), 'parse_error', response_text, analyzed_at)
+        
+        analysis['analysis_metadata'] = {
+            'analyzed_at': analyzed_at or _now_iso(),
+            'association_name': association_data.get('name') or association_data.get('company_name', 'Unknown'),
+            'provider': self.llm_manager.active_provider
+        }
+        return analysis
+    
+    def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse a JSON reply, stripping any markdown code fence around it"""
+        return _loads(MARKDOWN_FENCE_RE.sub('', response_text))
+    
+    def _fallback_analysis(self, association_data: Dict[str, Any], error: str, error_type: str,
+                           raw_response: Optional[str] = None, analyzed_at: Optional[str] = None) -> Dict[str, Any]:
+        """Zero-confidence analysis returned when the AI analysis could not be produced"""
+        fallback = {
+            'digital_maturity_assessment': {
+                'overall_score': 0,
+                'website_quality': 0,
+                'digital_services': 0,
+                'innovation_readiness': 0,
+                'key_strengths': [],
+                'key_gaps': []
+            },
+            'ai_transformation_opportunities': [],
+            'competitive_positioning': {},
+            'strategic_recommendations': [],
+            'confidence_metrics': {
+                'analysis_confidence': 0,
+                'recommendation_confidence': 0,
+                'data_completeness': 0
+            },
+            'error': error,
+            'error_type': error_type,
+            'analysis_metadata': {
+                'analyzed_at': analyzed_at or _now_iso(),
+                'association_name': association_data.get('name') or association_data.get('company_name', 'Unknown'),
+                'provider': self.llm_manager.active_provider
+            }
+        }
+        if raw_response is not None:
+            fallback['raw_response'] = raw_response
+        return fallback
+    
+    @staticmethod
+    def _insight_sample(result: Dict[str, Any]) -> Dict[str, Any]:
+        """The parts of an analysis the business insights prompt needs"""
+        return {
+            'name': result.get('analysis_metadata', {}).get('association_name', 'Unknown'),
+            'overall_score': result.get('digital_maturity_assessment', {}).get('overall_score', 0),
+            'analysis_confidence': result.get('confidence_metrics', {}).get('analysis_confidence', 0),
+            'ai_transformation_opportunities': result.get('ai_transformation_opportunities', [])[:INSIGHT_SAMPLE_OPPORTUNITIES]
+        }
+    
+    @staticmethod
+    def _digital_features(associations_data: List[Dict[str, Any]]) -> np.ndarray:
+        """Boolean matrix of which DIGITAL_FEATURES each association has, one row per association"""
+        flags = np.fromiter(
+            (bool(a.get(feature)) for a in associations_data for feature in DIGITAL_FEATURES),
+            dtype=bool, count=len(associations_data) * len(DIGITAL_FEATURES)
+        )
+        return flags.reshape(len(associations_data), len(DIGITAL_FEATURES))
+    
+    def _calculate_digital_distribution(self, features: np.ndarray) -> Dict[str, Any]:
+        """Split associations into digital leaders, followers and laggards by feature score"""
+        if not len(features):
+            return {'average_digital_score': 0, 'digital_leaders': 0, 'digital_followers': 0, 'digital_laggards': 0}
+        
+        scores = features @ DIGITAL_FEATURE_WEIGHTS
+        avg_score = float(scores.mean())
+        leaders = int(np.count_nonzero(scores > avg_score * 1.2))
+        laggards = int(np.count_nonzero(scores < avg_score * 0.8))
+        
+        return {
+            'average_digital_score': round(avg_score, 2),
+            'digital_leaders': leaders,
+            'digital_followers': len(scores) - leaders - laggards,
+            'digital_laggards': laggards
+        }
+    
+    def _identify_market_trends(self, features: np.ndarray) -> Dict[str, Any]:
+        """Adoption rates (%) of the main digital features across the associations"""
+        if not len(features):
+            return {}
+        
+        rates = features.mean(axis=0) * 100
+        return {trend: round(float(rate), 1) for trend, rate in zip(DIGITAL_FEATURE_TRENDS, rates)}
 
+@functools.lru_cache(maxsize=1)
 def get_vertex_ai_agent() -> ProductionVertexAIAgent:
     """Get global vertex AI agent instance"""
-    global vertex_ai_agent
-    if vertex_ai_agent is None:
-        vertex_ai_agent = ProductionVertexAIAgent()
-    return vertex_ai_agent
\ No newline at end of file
+    return ProductionVertexAIAgent()
\ No newline at end of file